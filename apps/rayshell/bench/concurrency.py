@@ -0,0 +1,71 @@
+import os, sys, json, time, argparse, threading
+
+os.environ.setdefault("RAYSHELL_BATCH_SEQS", "4")
+
+from apps.rayshell.core.engine import LlamaEngine
+from apps.rayshell.bench.pipeline import QUERIES, summarize
+
+
+def run(engine, users: int, rounds: int, batched: bool):
+    batcher = engine.batcher
+    if not batched:
+        engine.batcher = None
+    replies = []
+    latencies = []
+    lock = threading.Lock()
+
+    def user(i):
+        session = f"bench-user-{i}"
+        for r in range(rounds):
+            start = time.perf_counter()
+            text = "".join(engine.generate(QUERIES[(i + r) % len(QUERIES)], session))
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                replies.append(text)
+        engine.forget(session)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user, args=(i,)) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    engine.batcher = batcher
+
+    tokens = sum(len(engine.llm.tokenize(text.encode("utf-8"), add_bos=False)) for text in replies)
+    return {
+        "wall_s": wall,
+        "requests": len(replies),
+        "tokens": tokens,
+        "tokens_per_sec": tokens / wall,
+        "latency_ms": summarize(latencies),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate tokens/sec for concurrent users, batched vs serialized")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    engine = LlamaEngine(args.model, background=False)
+    engine.waitReady()
+    if engine.batcher is None:
+        raise SystemExit("batching is disabled, set RAYSHELL_BATCH_SEQS above 1")
+    report = {
+        "users": args.users,
+        "slots": engine.batcher.seqs,
+        "serialized": run(engine, args.users, args.rounds, batched=False),
+        "batched": run(engine, args.users, args.rounds, batched=True),
+        "batch": engine.batcher.stats,
+    }
+    report["speedup"] = report["batched"]["tokens_per_sec"] / max(report["serialized"]["tokens_per_sec"], 1e-9)
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import sys, json, time, random, argparse, tempfile
+from pathlib import Path
+from apps.rayshell.core.history import HistoryStore, connect, INSERT
+from apps.rayshell.bench.pipeline import summarize
+
+VERBS = ["git", "docker", "kubectl", "ls", "cd", "grep", "find", "ssh", "systemctl", "journalctl", "nmcli", "pip", "make"]
+ARGS = ["status", "log --oneline", "ps -a", "get pods", "-la", "~/src", "-rn TODO .", ". -name '*.py'", "user@host",
+        "restart NetworkManager", "-u sshd -f", "dev wifi list", "install -e .", "-j8", "checkout main", "logs -f api"]
+TYPED = ["git checkout", "docker logs", "nmcli wifi", "journalctl -u", "gco", "ssh user@", "zzzz-nothing", "ls"]
+
+
+def populate(path: Path, rows: int):
+    conn = connect(path)
+    rng = random.Random(7)
+    batch = []
+    start = time.time() - rows
+    conn.execute("BEGIN")
+    for i in range(rows):
+        cmd = f"{rng.choice(VERBS)} {rng.choice(ARGS)} {rng.randrange(rows)}"
+        batch.append((start + i, "/home/user", "executed", cmd, rng.choice((0, 0, 0, 1)), "rayshell"))
+        if len(batch) == 50000:
+            conn.executemany(INSERT, batch)
+            batch = []
+    conn.executemany(INSERT, batch)
+    conn.execute("COMMIT")
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Per-keystroke latency of the RayShell history search")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--db", default=None, help="existing history database; omit to build a synthetic one")
+    parser.add_argument("--writes", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    tmp = None
+    if args.db:
+        path = Path(args.db)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        path = Path(tmp.name) / "history.db"
+    store = HistoryStore(path)
+    built = None
+    if not args.db:
+        start = time.perf_counter()
+        populate(path, args.rows)
+        built = time.perf_counter() - start
+
+    keystrokes = []
+    for typed in TYPED:
+        for end in range(1, len(typed) + 1):
+            start = time.perf_counter()
+            store.search(typed[:end])
+            keystrokes.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for i in range(args.writes):
+        store.add(f"echo bench {i}", "executed", cwd="/tmp")
+    enqueue = (time.perf_counter() - start) * 1e6 / args.writes
+    store.flush()
+    drained = time.perf_counter() - start
+
+    report = {
+        "rows": store.query("SELECT COUNT(*) FROM events")[0][0],
+        "build_s": built,
+        "keystroke_ms": summarize(keystrokes),
+        "add_us": enqueue,
+        "writes_per_sec": args.writes / drained,
+    }
+    store.close()
+    if tmp is not None:
+        tmp.cleanup()
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
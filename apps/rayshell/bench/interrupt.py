@@ -0,0 +1,66 @@
+import sys, json, time, argparse, threading, statistics
+from apps.rayshell.core.engine import LlamaEngine
+
+QUERY = "Explain in detail how to list every listening TCP port and the owning process."
+
+
+def trial(engine, warmTokens: int):
+    cancel = threading.Event()
+    warmed = threading.Event()
+    counts = {"before": 0, "after": 0}
+    ended = []
+
+    def consume():
+        for _ in engine.generate(QUERY, session="bench-interrupt", cancel=cancel):
+            if cancel.is_set():
+                counts["after"] += 1
+            else:
+                counts["before"] += 1
+                if counts["before"] >= warmTokens:
+                    warmed.set()
+        ended.append(time.perf_counter())
+        warmed.set()
+
+    worker = threading.Thread(target=consume)
+    worker.start()
+    warmed.wait()
+    start = time.perf_counter()
+    cancel.set()
+    worker.join()
+    idle = ended[0] - start
+    engine.forget("bench-interrupt")
+    return {"idle_ms": idle * 1000, "tokens_after_interrupt": counts["after"], "tokens_before": counts["before"]}
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "min": values[0],
+        "median": statistics.median(values),
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure RayShell interrupt-to-idle latency")
+    parser.add_argument("--trials", type=int, default=20)
+    parser.add_argument("--after", type=int, default=8, help="tokens to let through before interrupting")
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args(argv)
+
+    engine = LlamaEngine(args.model, background=False)
+    engine.waitReady()
+    results = [trial(engine, args.after) for _ in range(args.trials)]
+    report = {
+        "trials": args.trials,
+        "idle_ms": summarize([r["idle_ms"] for r in results]),
+        "tokens_after_interrupt": summarize([r["tokens_after_interrupt"] for r in results]),
+    }
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
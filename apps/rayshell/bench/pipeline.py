@@ -0,0 +1,225 @@
+import os, sys, json, time, argparse, tempfile, threading, statistics
+import numpy as np
+
+BENCH_HOME = tempfile.TemporaryDirectory(prefix="rayshell-bench-")
+for var in ("XDG_CACHE_HOME", "XDG_DATA_HOME", "XDG_CONFIG_HOME", "XDG_RUNTIME_DIR"):
+    os.environ[var] = os.path.join(BENCH_HOME.name, var.lower())
+os.environ.setdefault("RAYSHELL_RESPONSE_CACHE", "0")
+os.environ.setdefault("RAYSHELL_DAEMON", "0")
+os.environ.setdefault("RAYSHELL_RESTORE", "0")
+os.environ.setdefault("RAYSHELL_RECALL", "0")
+os.environ.setdefault("RAYSHELL_MAN_INDEX", "0")
+os.environ.setdefault("RAYSHELL_ROUTER", "0")
+
+from apps.rayshell.core.paths import CACHE_DIR
+from apps.rayshell.core.engine import LlamaEngine
+from apps.rayshell.core.shell import RayShell
+
+QUERIES = [
+    "how do I list every listening TCP port and the owning process",
+    "find files larger than 100MB in my home directory",
+    "what does tar -xzvf do",
+    "show disk usage of the current folder sorted by size",
+]
+FAKE_REPLY = "[SHELL]: 'echo rayshell-bench'\nThe datanet hums as the echo returns, a clean pulse through the wire."
+FAKE_MODEL = CACHE_DIR / "bench" / "fake-model.json"
+METRICS = ("parse_ms", "prompt_eval_ms", "ttft_ms", "tokens_per_sec", "dispatch_ms", "total_ms")
+
+
+class FakeState:
+    def __init__(self, input_ids, n_tokens: int):
+        self.input_ids = input_ids
+        self.n_tokens = n_tokens
+
+
+class FakeLlama:
+    """Deterministic stand-in for llama_cpp.Llama: byte tokens, fixed reply, configurable delays."""
+
+    def __init__(self, tokenDelay=0.02, promptDelay=0.0002, reply=FAKE_REPLY, n_ctx=8192):
+        self.tokenDelay = tokenDelay
+        self.promptDelay = promptDelay
+        self.reply = reply
+        self.ctx = n_ctx
+        self.input_ids = np.zeros(n_ctx, dtype=np.intc)
+        self.n_tokens = 0
+        self.context_params = type("ContextParams", (), {"logits_all": False})()
+        self._ctx = None
+
+    def n_ctx(self):
+        return self.ctx
+
+    def tokenize(self, text: bytes, add_bos=True, special=False):
+        return ([1] if add_bos else []) + [b + 3 for b in text]
+
+    def detokenize(self, tokens):
+        return bytes(t - 3 for t in tokens if t >= 3)
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def close(self):
+        self.n_tokens = 0
+
+    def eval(self, tokens):
+        time.sleep(self.promptDelay * len(tokens))
+        self.input_ids[self.n_tokens:self.n_tokens + len(tokens)] = tokens
+        self.n_tokens += len(tokens)
+
+    def save_state(self):
+        return FakeState(self.input_ids.copy(), self.n_tokens)
+
+    def load_state(self, state):
+        self.input_ids[:] = state.input_ids
+        self.n_tokens = state.n_tokens
+
+    def __call__(self, prompt, stream=False, stopping_criteria=None, max_tokens=70, **kwargs):
+        chunks = self.stream(prompt, stopping_criteria, max_tokens)
+        if stream:
+            return chunks
+        return {"choices": [{"text": "".join(c["choices"][0]["text"] for c in chunks)}]}
+
+    def stream(self, prompt, stopping_criteria, max_tokens):
+        common = 0
+        for a, b in zip(self.input_ids[:self.n_tokens], prompt):
+            if a != b:
+                break
+            common += 1
+        self.n_tokens = common
+        self.eval(prompt[common:])
+        reply = self.tokenize(self.reply.encode("utf-8"), add_bos=False)
+        for i in range(0, min(len(reply), max_tokens * 4), 4):
+            if stopping_criteria and any(c(self.input_ids[:self.n_tokens], None) for c in stopping_criteria):
+                return
+            time.sleep(self.tokenDelay)
+            token = reply[i:i + 4]
+            self.input_ids[self.n_tokens:self.n_tokens + len(token)] = token
+            self.n_tokens += len(token)
+            yield {"choices": [{"text": self.detokenize(token).decode("utf-8", "ignore")}]}
+
+
+class FakeEngine(LlamaEngine):
+    def __init__(self, tokenDelay: float, promptDelay: float):
+        self.fakeConfig = {"tokenDelay": tokenDelay, "promptDelay": promptDelay, "reply": FAKE_REPLY}
+        FAKE_MODEL.parent.mkdir(parents=True, exist_ok=True)
+        with open(FAKE_MODEL, "w", encoding="utf-8") as fh:
+            json.dump(self.fakeConfig, fh)
+        super().__init__(str(FAKE_MODEL), background=False)
+
+    def buildModel(self):
+        self.draft = None
+        return FakeLlama(self.fakeConfig["tokenDelay"], self.fakeConfig["promptDelay"])
+
+
+class Probe:
+    def __init__(self, shell):
+        self.shell = shell
+        self.done = threading.Event()
+        self.first = None
+        self.dispatch = 0.0
+        self.dispatched = []
+        notify, runQuery = shell.notify, shell.runQuery
+
+        def timedNotify(msg):
+            start = time.perf_counter()
+            notify(msg)
+            self.dispatch += time.perf_counter() - start
+
+        def timedRun(cmd):
+            try:
+                runQuery(cmd)
+            finally:
+                self.done.set()
+
+        shell.notify = timedNotify
+        shell.runQuery = timedRun
+        shell.sendCmd = self.dispatched.append
+        shell.addListener(self.listen)
+
+    def listen(self, msg):
+        if self.first is None:
+            self.first = time.perf_counter()
+
+    def measure(self, query: str):
+        self.done.clear()
+        self.first = None
+        self.dispatch = 0.0
+        self.shell.engine.forget(self.shell.session)
+        start = time.perf_counter()
+        self.shell.parseCmd("!" + query)
+        parsed = time.perf_counter()
+        self.done.wait()
+        end = time.perf_counter()
+        speed = self.shell.engine.speed
+        return {
+            "parse_ms": (parsed - start) * 1000,
+            "prompt_eval_ms": speed.get("promptEvalMs", 0.0),
+            "ttft_ms": ((self.first or end) - start) * 1000,
+            "tokens_per_sec": speed.get("tokensPerSec", 0.0),
+            "dispatch_ms": self.dispatch * 1000,
+            "total_ms": (end - start) * 1000,
+        }
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        "min": values[0],
+        "median": statistics.median(values),
+        "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+        "max": values[-1],
+    }
+
+
+def compare(report, baseline):
+    rows = {}
+    for metric in METRICS:
+        old = baseline.get("metrics", {}).get(metric, {}).get("median")
+        new = report["metrics"][metric]["median"]
+        if not old:
+            continue
+        rows[metric] = {"baseline": old, "current": new, "change_pct": (new - old) / old * 100}
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Drive RayShell.parseCmd end to end and time each stage")
+    parser.add_argument("--model", default=None, help="GGUF path; omit to use the fake Llama")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="fake per-token delay in seconds")
+    parser.add_argument("--prompt-delay", type=float, default=0.0002, help="fake per-prompt-token delay in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=None, help="write the JSON report here")
+    parser.add_argument("--baseline", default=None, help="compare against a saved report")
+    args = parser.parse_args(argv)
+
+    if args.model:
+        engine = LlamaEngine(args.model, background=False)
+        backend = {"backend": "llama", "model": args.model}
+    else:
+        engine = FakeEngine(args.token_delay, args.prompt_delay)
+        backend = {"backend": "fake", "token_delay": args.token_delay, "prompt_delay": args.prompt_delay}
+    engine.waitReady()
+    shell = RayShell(engine=engine)
+    probe = Probe(shell)
+
+    results = [probe.measure(q) for _ in range(args.repeat) for q in QUERIES]
+    shell.close()
+    report = {
+        **backend,
+        "time": time.time(),
+        "queries": len(results),
+        "load": engine.timings,
+        "metrics": {m: summarize([r[m] for r in results]) for m in METRICS},
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            report["comparison"] = compare(report, json.load(fh))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=4)
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
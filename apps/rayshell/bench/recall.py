@@ -0,0 +1,74 @@
+import sys, json, time, argparse, tempfile
+from pathlib import Path
+import numpy as np
+from apps.rayshell.core.recall import RecallIndex, HashEmbedder, loadEmbedder
+from apps.rayshell.bench.pipeline import QUERIES, summarize
+
+
+def populate(root: Path, rows: int, dim: int, identity: str):
+    rng = np.random.default_rng(7)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / "entries.jsonl", "w", encoding="utf-8") as fh:
+        for i in range(rows):
+            fh.write(json.dumps({"ts": 0, "question": f"synthetic question {i}", "answer": "-", "command": None}) + "\n")
+    with open(root / f"{identity}-{dim}.f32", "wb") as fh:
+        for start in range(0, rows, 65536):
+            block = rng.standard_normal((min(65536, rows - start), dim)).astype(np.float32)
+            block /= np.linalg.norm(block, axis=1, keepdims=True)
+            fh.write(block.tobytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Top-k latency and append cost of the RayShell recall index")
+    parser.add_argument("--model", default=None, help="embedding GGUF; omit to use feature hashing")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--adds", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    embedder = loadEmbedder(args.model) if args.model else HashEmbedder()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        populate(root, args.rows, embedder.dim, embedder.identity)
+        start = time.perf_counter()
+        index = RecallIndex(embedder, root=root)
+        index.ready.wait()
+        opened = (time.perf_counter() - start) * 1000
+
+        embed, search = [], []
+        for query in QUERIES * 5:
+            start = time.perf_counter()
+            embedder.embed(query)
+            embed.append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            index.search(query, 5)
+            search.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        for i in range(args.adds):
+            index.add(f"{QUERIES[i % len(QUERIES)]} #{i}", "answer", "true")
+        enqueue = (time.perf_counter() - start) * 1e6 / args.adds
+        target = args.rows + args.adds
+        while index.rows < target:
+            time.sleep(0.001)
+        drained = time.perf_counter() - start
+        hit = index.lookup(f"{QUERIES[0]} #0")
+        index.close()
+
+    report = {
+        "embedder": embedder.identity,
+        "dim": embedder.dim,
+        "rows": target,
+        "open_ms": opened,
+        "embed_ms": summarize(embed),
+        "search_ms": summarize(search),
+        "add_us": enqueue,
+        "appends_per_sec": args.adds / drained,
+        "self_hit": hit is not None,
+    }
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import sys, json, shutil, argparse
+from apps.rayshell.bench.pipeline import FakeEngine, QUERIES, summarize
+from apps.rayshell.core.engine import LlamaEngine
+from apps.rayshell.core.sessionstore import SessionStore
+
+SESSION = "bench-restore"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare RayShell session restore against re-evaluating the history")
+    parser.add_argument("--model", default=None, help="GGUF path; omit to use the fake Llama")
+    parser.add_argument("--turns", type=int, default=8)
+    parser.add_argument("--trials", type=int, default=5)
+    parser.add_argument("--prompt-delay", type=float, default=0.0002, help="fake per-prompt-token delay in seconds")
+    args = parser.parse_args(argv)
+
+    engine = LlamaEngine(args.model, background=False) if args.model else FakeEngine(0.0, args.prompt_delay)
+    engine.waitReady()
+    engine.forget(SESSION)
+    for i in range(args.turns):
+        for _ in engine.generate(QUERIES[i % len(QUERIES)], SESSION):
+            pass
+    engine.checkpoint(SESSION)
+
+    results = []
+    for _ in range(args.trials):
+        engine.forget(SESSION)
+        results.append(engine.restore(SESSION, compare=True))
+    shutil.rmtree(SessionStore(SESSION).dir, ignore_errors=True)
+
+    report = {
+        "backend": "llama" if args.model else "fake",
+        "turns": args.turns,
+        "tokens": results[0]["tokens"],
+        "read_ms": summarize([r["readMs"] for r in results]),
+        "restore_ms": summarize([r["readMs"] + r["restoreMs"] for r in results]),
+        "reeval_ms": summarize([r["reevalMs"] for r in results]),
+    }
+    report["speedup"] = report["reeval_ms"]["median"] / max(report["restore_ms"]["median"], 1e-6)
+    json.dump(report, sys.stdout, indent=4)
+    print()
+    return report
+
+
+if __name__ == "__main__":
+    main()
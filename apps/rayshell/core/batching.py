@@ -0,0 +1,251 @@
+import os, codecs, threading
+from collections import deque
+import numpy as np
+import llama_cpp
+from llama_cpp._internals import LlamaContext, LlamaBatch
+from apps.rayshell.core.scheduler import Subscriber, DONE
+
+BATCH_SEQS = int(os.environ.get("RAYSHELL_BATCH_SEQS", 1))
+SEQ_CTX = int(os.environ.get("RAYSHELL_BATCH_CTX", 4096))
+BATCH_TOKENS = 512
+TEMPERATURE = 0.8
+TOP_K = 40
+TOP_P = 0.95
+
+
+class Sequence:
+    def __init__(self, tokens, maxTokens: int, stop, cancel=None):
+        self.tokens = list(tokens)
+        self.maxTokens = maxTokens
+        self.stop = stop
+        self.sub = Subscriber(cancel)
+        self.slot = None
+        self.pos = 0
+        self.fed = 0
+        self.last = None
+        self.generated = []
+        self.text = ""
+        self.sent = 0
+        self.stopped = False
+        self.decoder = codecs.getincrementaldecoder("utf-8")("ignore")
+
+    @property
+    def prefilling(self):
+        return self.fed < len(self.tokens)
+
+    def __iter__(self):
+        return iter(self.sub)
+
+    def emit(self, piece: bytes, final=False):
+        self.text += self.decoder.decode(piece, final)
+        cuts = [i for i in (self.text.find(s) for s in self.stop) if i >= 0]
+        if cuts:
+            self.flush(min(cuts))
+            self.stopped = True
+            return True
+        hold = 0
+        if not final:
+            for s in self.stop:
+                for k in range(min(len(s) - 1, len(self.text)), hold, -1):
+                    if self.text.endswith(s[:k]):
+                        hold = k
+                        break
+        self.flush(len(self.text) - hold)
+        return False
+
+    def flush(self, end: int):
+        if end > self.sent:
+            self.sub.queue.put(self.text[self.sent:end])
+            self.sent = end
+
+
+class BatchDecoder:
+    """Decodes several sequences in one llama context, one forward pass per step."""
+
+    def __init__(self, llm, systemTokens, seqs=BATCH_SEQS, seqCtx=SEQ_CTX, threads=None, batchThreads=None):
+        self.llm = llm
+        self.seqs = seqs
+        self.system = list(systemTokens)
+        self.seqCtx = seqCtx
+        params = llama_cpp.llama_context_default_params()
+        params.n_ctx = seqCtx * seqs + len(self.system)
+        params.n_batch = BATCH_TOKENS
+        params.n_ubatch = BATCH_TOKENS
+        params.n_seq_max = seqs + 1
+        if threads:
+            params.n_threads = threads
+            params.n_threads_batch = batchThreads or threads
+        self.ctx = LlamaContext(model=llm._model, params=params, verbose=False)
+        self.batch = LlamaBatch(n_tokens=BATCH_TOKENS, embd=0, n_seq_max=seqs + 1, verbose=False)
+        self.nVocab = llm.n_vocab()
+        self.eos = llm.token_eos()
+        self.rng = np.random.default_rng()
+        self.free = deque(range(1, seqs + 1))
+        self.waiting = deque()
+        self.active = []
+        self.turn = 0
+        self.cond = threading.Condition()
+        self.closed = False
+        self.stats = {"steps": 0, "tokens": 0, "maxBatch": 0}
+        self.prefillSystem()
+        self.thread = threading.Thread(target=self.run, name="rayshell-batch", daemon=True)
+        self.thread.start()
+
+    def prefillSystem(self):
+        for start in range(0, len(self.system), BATCH_TOKENS):
+            self.batch.reset()
+            chunk = self.system[start:start + BATCH_TOKENS]
+            for i, token in enumerate(chunk):
+                self.add(token, start + i, 0, start + i == len(self.system) - 1)
+            self.ctx.decode(self.batch)
+
+    def submit(self, tokens, maxTokens: int, stop, cancel=None):
+        if len(tokens) + maxTokens > self.seqCtx + len(self.system):
+            raise ValueError("prompt too long for a batch slot")
+        seq = Sequence(tokens, maxTokens, stop, cancel)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("batch decoder closed")
+            self.waiting.append(seq)
+            self.cond.notify()
+        return seq
+
+    def busy(self):
+        with self.cond:
+            return bool(self.active or self.waiting)
+
+    def admit(self):
+        while self.free and self.waiting:
+            seq = self.waiting.popleft()
+            if seq.sub.cancelled():
+                seq.sub.queue.put(DONE)
+                continue
+            seq.slot = self.free.popleft()
+            self.ctx.kv_cache_seq_rm(seq.slot, -1, -1)
+            shared = 0
+            for a, b in zip(self.system, seq.tokens):
+                if a != b:
+                    break
+                shared += 1
+            shared = min(shared, len(seq.tokens) - 1)
+            if shared:
+                self.ctx.kv_cache_seq_cp(0, seq.slot, 0, shared)
+            seq.fed = seq.pos = shared
+            self.active.append(seq)
+
+    def add(self, token: int, pos: int, seq: int, logits: bool):
+        batch = self.batch.batch
+        i = batch.n_tokens
+        batch.token[i] = token
+        batch.pos[i] = pos
+        batch.n_seq_id[i] = 1
+        batch.seq_id[i][0] = seq
+        batch.logits[i] = logits
+        batch.n_tokens += 1
+        return i
+
+    def run(self):
+        while self.step():
+            pass
+
+    def step(self):
+        with self.cond:
+            self.admit()
+            while not self.active and not self.closed:
+                self.cond.wait()
+                self.admit()
+            if self.closed:
+                return False
+            for seq in [s for s in self.active if s.sub.cancelled()]:
+                self.finish(seq)
+            active = list(self.active)
+        if not active:
+            return True
+
+        self.batch.reset()
+        outputs = []
+        for seq in active:
+            if not seq.prefilling:
+                outputs.append((seq, self.add(seq.last, seq.pos, seq.slot, True)))
+                seq.pos += 1
+        budget = BATCH_TOKENS - len(outputs)
+        prefilling = [s for s in active if s.prefilling]
+        if prefilling:
+            self.turn = (self.turn + 1) % len(prefilling)
+            prefilling = prefilling[self.turn:] + prefilling[:self.turn]
+            share = max(1, budget // len(prefilling))
+            for seq in prefilling:
+                take = min(budget, share, len(seq.tokens) - seq.fed)
+                if take <= 0:
+                    break
+                for token in seq.tokens[seq.fed:seq.fed + take]:
+                    index = self.add(token, seq.pos, seq.slot, seq.pos == len(seq.tokens) - 1)
+                    seq.pos += 1
+                seq.fed += take
+                budget -= take
+                if not seq.prefilling:
+                    outputs.append((seq, index))
+
+        try:
+            self.ctx.decode(self.batch)
+        except Exception as e:
+            with self.cond:
+                for seq in active:
+                    self.finish(seq, e)
+            return True
+
+        self.stats["steps"] += 1
+        self.stats["tokens"] += len(outputs)
+        self.stats["maxBatch"] = max(self.stats["maxBatch"], len(outputs))
+        for seq, index in outputs:
+            self.accept(seq, self.sample(index))
+        return True
+
+    def sample(self, index: int):
+        logits = np.ctypeslib.as_array(llama_cpp.llama_get_logits_ith(self.ctx.ctx, index), shape=(self.nVocab,))
+        if TEMPERATURE <= 0:
+            return int(np.argmax(logits))
+        top = np.argpartition(logits, -TOP_K)[-TOP_K:]
+        scaled = logits[top] / TEMPERATURE
+        probs = np.exp(scaled - scaled.max())
+        probs /= probs.sum()
+        order = np.argsort(-probs)
+        keep = order[:np.searchsorted(np.cumsum(probs[order]), TOP_P) + 1]
+        return int(top[self.rng.choice(keep, p=probs[keep] / probs[keep].sum())])
+
+    def accept(self, seq, token: int):
+        if token == self.eos:
+            with self.cond:
+                self.finish(seq)
+            return
+        seq.generated.append(token)
+        stopped = seq.emit(self.llm.detokenize([token]))
+        if stopped or len(seq.generated) >= seq.maxTokens:
+            with self.cond:
+                self.finish(seq)
+        else:
+            seq.last = token
+
+    def finish(self, seq, error=None):
+        if seq not in self.active:
+            return
+        self.active.remove(seq)
+        self.ctx.kv_cache_seq_rm(seq.slot, -1, -1)
+        self.free.append(seq.slot)
+        if error is not None:
+            seq.sub.queue.put(error)
+        elif not seq.stopped:
+            seq.emit(b"", final=True)
+        seq.sub.queue.put(DONE)
+        self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            for seq in list(self.active):
+                self.finish(seq, RuntimeError("model unloaded"))
+            while self.waiting:
+                self.waiting.popleft().sub.queue.put(DONE)
+            self.cond.notify_all()
+        self.thread.join()
+        self.ctx.close()
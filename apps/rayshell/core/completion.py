@@ -0,0 +1,262 @@
+import os, time, bisect, threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from apps.rayshell.core.recognizer import CommandRecognizer
+
+PATH_TTL = 2.0
+MAX_LISTING = 20000
+MAX_CANDIDATES = 200
+SYNC_INTERVAL = 1.0
+
+Completion = namedtuple("Completion", "line candidates")
+
+
+class Node:
+    __slots__ = ("edges", "terminal", "size")
+
+    def __init__(self):
+        self.edges = {}
+        self.terminal = False
+        self.size = 0
+
+
+class PrefixTrie:
+    """Radix trie over strings; inserts and removals are incremental, lookups walk only the prefix."""
+
+    def __init__(self, words=()):
+        self.root = Node()
+        for word in words:
+            self.insert(word)
+
+    def __len__(self):
+        return self.root.size
+
+    def __contains__(self, word: str):
+        node, path = self.locate(word)
+        return node is not None and path == word and node.terminal
+
+    def insert(self, word: str):
+        if word in self:
+            return False
+        node = self.root
+        node.size += 1
+        rest = word
+        while rest:
+            edge = node.edges.get(rest[0])
+            if edge is None:
+                child = Node()
+                child.terminal = True
+                child.size = 1
+                node.edges[rest[0]] = [rest, child]
+                return True
+            label, child = edge
+            common = 0
+            limit = min(len(label), len(rest))
+            while common < limit and label[common] == rest[common]:
+                common += 1
+            if common < len(label):
+                middle = Node()
+                middle.size = child.size
+                middle.edges[label[common]] = [label[common:], child]
+                edge[0], edge[1] = label[:common], middle
+                child = middle
+            child.size += 1
+            node = child
+            rest = rest[common:]
+        node.terminal = True
+        return True
+
+    def remove(self, word: str):
+        if word not in self:
+            return False
+        node = self.root
+        rest = word
+        while True:
+            node.size -= 1
+            if not rest:
+                node.terminal = False
+                return True
+            label, child = node.edges[rest[0]]
+            if child.size == 1:
+                del node.edges[rest[0]]
+                return True
+            node = child
+            rest = rest[len(label):]
+
+    def locate(self, prefix: str):
+        node = self.root
+        path = ""
+        rest = prefix
+        while rest:
+            edge = node.edges.get(rest[0])
+            if edge is None:
+                return None, None
+            label, child = edge
+            if rest.startswith(label):
+                rest = rest[len(label):]
+            elif label.startswith(rest):
+                rest = ""
+            else:
+                return None, None
+            path += label
+            node = child
+        return node, path
+
+    def complete(self, prefix: str, limit=MAX_CANDIDATES):
+        node, path = self.locate(prefix)
+        if node is None:
+            return []
+        out = []
+        stack = [(node, path)]
+        while stack and len(out) < limit:
+            node, path = stack.pop()
+            if node.terminal:
+                out.append(path)
+            for key in sorted(node.edges, reverse=True):
+                label, child = node.edges[key]
+                stack.append((child, path + label))
+        return out
+
+    def extend(self, prefix: str):
+        node, path = self.locate(prefix)
+        if node is None:
+            return prefix
+        while not node.terminal and len(node.edges) == 1:
+            label, node = next(iter(node.edges.values()))
+            path += label
+        return path
+
+
+class PathCache:
+    def __init__(self, pool, onReady):
+        self.pool = pool
+        self.onReady = onReady
+        self.listings = {}
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def listing(self, directory: str):
+        with self.lock:
+            hit = self.listings.get(directory)
+            stale = hit is None or time.monotonic() - hit[0] > PATH_TTL
+            if stale and directory not in self.pending:
+                self.pending.add(directory)
+                self.pool.submit(self.scan, directory)
+        return hit[1] if hit else None
+
+    def scan(self, directory: str):
+        entries = []
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        entries.append(entry.name + "/" if entry.is_dir() else entry.name)
+                    except OSError:
+                        entries.append(entry.name)
+                    if len(entries) >= MAX_LISTING:
+                        break
+        except OSError:
+            pass
+        entries.sort()
+        with self.lock:
+            self.listings[directory] = (time.monotonic(), entries)
+            self.pending.discard(directory)
+        self.onReady(directory)
+
+
+class Completer:
+    def __init__(self, recognizer=None, history=()):
+        self.recognizer = recognizer or CommandRecognizer()
+        self.commands = PrefixTrie(self.recognizer.names)
+        self.known = set(self.recognizer.names)
+        self.history = PrefixTrie(history)
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="rayshell-complete")
+        self.paths = PathCache(self.pool, self.listingReady)
+        self.lastSync = time.monotonic()
+        self.syncing = False
+        self.waiting = None
+        self.listeners = []
+
+    def addListener(self, callback):
+        self.listeners.append(callback)
+
+    def addHistory(self, cmd: str):
+        cmd = cmd.strip()
+        if cmd:
+            with self.lock:
+                self.history.insert(cmd)
+
+    def maybeSync(self):
+        if self.syncing or time.monotonic() - self.lastSync < SYNC_INTERVAL:
+            return
+        self.syncing = True
+        self.pool.submit(self.sync)
+
+    def sync(self):
+        try:
+            self.recognizer.maybeRefresh()
+            names = set(self.recognizer.names)
+            added, removed = names - self.known, self.known - names
+            if added or removed:
+                with self.lock:
+                    for name in removed:
+                        self.commands.remove(name)
+                    for name in added:
+                        self.commands.insert(name)
+                self.known = names
+        finally:
+            self.lastSync = time.monotonic()
+            self.syncing = False
+
+    def complete(self, line: str):
+        self.maybeSync()
+        marker = "$" if line.startswith("$") else ""
+        prefix, sep, word = line[len(marker):].rpartition(" ")
+        lead = marker + prefix + sep
+
+        with self.lock:
+            history = self.history.complete(line) if line.strip() else []
+            if not prefix.strip() and "/" not in word and not word.startswith(("~", ".")):
+                matches = self.commands.complete(word)
+                suffix = " " if len(matches) == 1 else ""
+                return self.result(line, lead + self.commands.extend(word) + suffix, matches, history)
+
+        directory, slash, stem = word.rpartition("/")
+        directory = (directory or "/") if slash else "."
+        listing = self.paths.listing(os.path.expanduser(directory))
+        if listing is None:
+            self.waiting = line
+            return None
+        hidden = stem.startswith(".")
+        names = []
+        for name in listing[bisect.bisect_left(listing, stem):]:
+            if not name.startswith(stem) or len(names) >= MAX_CANDIDATES:
+                break
+            if hidden or not name.startswith("."):
+                names.append(name)
+        base = word[:len(word) - len(stem)]
+        extended = os.path.commonprefix(names) if names else stem
+        suffix = " " if len(names) == 1 and not names[0].endswith("/") else ""
+        return self.result(line, lead + base + extended + suffix, [base + n for n in names], history)
+
+    def result(self, line: str, completed: str, matches, history):
+        if completed == line and history and not matches:
+            completed = os.path.commonprefix(history)
+        candidates = matches if len(matches) > 1 else []
+        if completed == line and len(history) > 1:
+            candidates = history + candidates
+        return Completion(completed, candidates[:MAX_CANDIDATES])
+
+    def listingReady(self, directory: str):
+        line, self.waiting = self.waiting, None
+        if line is None:
+            return
+        result = self.complete(line)
+        if result is None:
+            return
+        for callback in list(self.listeners):
+            try:
+                callback(line, result)
+            except Exception as e:
+                print(f"Completion callback error {e}")
@@ -0,0 +1,46 @@
+from apps.rayshell.core.debug import debug
+
+USER_TURN = "{query}<|im_end|>\n<|im_start|>assistant"
+TURN_END = "<|im_end|>\n<|im_start|>user\n"
+
+
+class Conversation:
+    def __init__(self, llm, systemTokens, budget, reserve):
+        self.llm = llm
+        self.systemTokens = list(systemTokens)
+        self.tokens = list(systemTokens)
+        self.turns = []
+        self.budget = budget
+        self.reserve = reserve
+        self.turnEnd = self.tokenize(TURN_END)
+
+    def tokenize(self, text: str):
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=False, special=True)
+
+    def prepare(self, query: str, reserve=None, context=None):
+        turn = self.tokenize(USER_TURN.format(query=query.strip()))
+        asked = self.tokenize(USER_TURN.format(query=f"{query.strip()}\n\n{context}")) if context else turn
+        dropped = self.trim(len(asked) + (reserve or self.reserve))
+        return self.tokens + asked, dropped, self.tokens + turn
+
+    def commit(self, prompt, kvTokens, kept=None):
+        start = len(self.tokens)
+        reply = kvTokens[len(prompt):] if kvTokens[:len(prompt)] == prompt else []
+        self.tokens = (kept or prompt) + reply + self.turnEnd
+        self.turns.append((start, len(self.tokens)))
+
+    def trim(self, need: int):
+        if len(self.tokens) + need <= self.budget or not self.turns:
+            return None
+        lowWater = self.budget * 3 // 4
+        start = self.turns[0][0]
+        count = 0
+        end = start
+        while count < len(self.turns) and len(self.tokens) - (end - start) + need > lowWater:
+            end = self.turns[count][1]
+            count += 1
+        removed = end - start
+        self.tokens = self.tokens[:start] + self.tokens[end:]
+        self.turns = [(a - removed, b - removed) for a, b in self.turns[count:]]
+        debug(f"conversation trimmed {count} turns ({removed} tokens)")
+        return start, end
@@ -0,0 +1,308 @@
+import os, sys, json, stat, time, fcntl, socket, struct, threading, subprocess, socketserver
+from contextlib import closing
+from apps.rayshell.core.paths import RUNTIME_DIR
+
+SOCKET_PATH = os.environ.get("RAYSHELL_SOCKET", str(RUNTIME_DIR / "rayshell.sock"))
+LOCK_PATH = SOCKET_PATH + ".lock"
+CONNECT_TIMEOUT = 120
+CANCEL_POLL = 0.02
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+def secureDir(path):
+    # the /tmp fallback name is predictable, so only trust a directory we own and nobody else can enter
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) != 0o700:
+        raise DaemonError(f"refusing insecure runtime directory {path}")
+
+
+def peerUid(sock):
+    return struct.unpack("3i", sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")))[1]
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        if peerUid(self.connection) != os.getuid():
+            return
+        try:
+            request = json.loads(self.rfile.readline() or b"{}")
+        except ValueError:
+            self.reply({"error": "malformed request"})
+            return
+
+        op = request.get("op")
+        if op == "ping":
+            engine = self.server.engine
+            self.reply({
+                "ok": True,
+                "state": engine.state if engine else ("failed" if self.server.loadError else "loading"),
+                "timings": engine.timings if engine else {},
+                "queue": engine.scheduler.stats() if engine else {},
+                "speed": engine.speed if engine else {},
+                "memory": engine.memory if engine else {},
+                "batch": engine.batcher.stats if engine and engine.batcher else {},
+            })
+            return
+        if op == "forget":
+            if self.server.engine is not None:
+                self.server.engine.forget(request.get("session"))
+            self.reply({"done": True})
+            return
+        if op in ("checkpoint", "restore", "remember"):
+            self.server.ready.wait()
+            if self.server.engine is None:
+                self.reply({"error": self.server.loadError or "model failed to load"})
+                return
+            try:
+                if op == "checkpoint":
+                    result = self.server.engine.checkpoint(request.get("session"))
+                elif op == "remember":
+                    result = self.server.engine.remember(request.get("session"), request.get("query", ""), request.get("reply", ""))
+                else:
+                    result = self.server.engine.restore(request.get("session"), request.get("compare", False))
+                self.reply({"done": True, "result": result})
+            except Exception as e:
+                self.reply({"error": str(e)})
+            return
+        if op != "generate":
+            self.reply({"error": f"unknown op {op!r}"})
+            return
+
+        cancel = threading.Event()
+        threading.Thread(target=self.watchCancel, args=(cancel,), daemon=True).start()
+        self.server.ready.wait()
+        if self.server.engine is None:
+            self.reply({"error": self.server.loadError or "model failed to load"})
+            return
+        try:
+            with closing(self.server.engine.generate(
+                request.get("query", ""),
+                request.get("session"),
+                cancel,
+                request.get("structured", False),
+                context=request.get("context"),
+            )) as chunks:
+                for text in chunks:
+                    self.reply({"chunk": text})
+            self.reply({"done": True})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        except Exception as e:
+            self.reply({"error": str(e)})
+
+    def watchCancel(self, cancel):
+        try:
+            for line in self.rfile:
+                if json.loads(line).get("op") == "cancel":
+                    break
+        except (OSError, ValueError):
+            pass
+        cancel.set()
+
+    def reply(self, message):
+        self.wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+class InferenceDaemon(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path=SOCKET_PATH):
+        secureDir(os.path.dirname(path))
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, RequestHandler)
+        os.chmod(path, 0o600)
+        self.path = path
+        self.engine = None
+        self.loadError = None
+        self.ready = threading.Event()
+
+    def load(self):
+        from apps.rayshell.core.engine import LlamaEngine
+        try:
+            self.engine = LlamaEngine(background=False)
+            if self.engine.state != "ready":
+                self.loadError = self.engine.error
+        except Exception as e:
+            self.loadError = str(e)
+            print(f"rayshell daemon: model load failed {e}")
+        self.ready.set()
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+class RemoteEngine:
+    def __init__(self, path=SOCKET_PATH):
+        self.path = path
+        self.state = "loading"
+        self.error = None
+        self.timings = {}
+        self.ready = threading.Event()
+        threading.Thread(target=self.watchReady, daemon=True).start()
+
+    def watchReady(self):
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while time.monotonic() < deadline:
+            status = self.status()
+            if status.get("state") in ("ready", "idle", "failed"):
+                self.state = "failed" if status["state"] == "failed" else "ready"
+                self.timings = status.get("timings", {})
+                break
+            time.sleep(0.1)
+        else:
+            self.state = "failed"
+            self.error = "RayShell daemon isn't answering"
+        self.ready.set()
+
+    @property
+    def speed(self):
+        return self.status().get("speed", {})
+
+    @property
+    def memory(self):
+        return self.status().get("memory", {})
+
+    def connect(self, timeout=CONNECT_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except (FileNotFoundError, ConnectionRefusedError):
+                sock.close()
+                if time.monotonic() > deadline:
+                    raise DaemonError("RayShell daemon isn't answering")
+                time.sleep(0.05)
+                continue
+            if peerUid(sock) != os.getuid():
+                sock.close()
+                raise DaemonError(f"{self.path} is served by another user")
+            return sock
+
+    def request(self, message, timeout=CONNECT_TIMEOUT):
+        sock = self.connect(timeout)
+        sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        return sock
+
+    def status(self):
+        try:
+            with closing(self.request({"op": "ping"}, timeout=0)) as sock:
+                return json.loads(sock.makefile("rb").readline() or b"{}")
+        except (OSError, ValueError, DaemonError):
+            return {}
+
+    def forget(self, session):
+        try:
+            with closing(self.request({"op": "forget", "session": session}, timeout=0)) as sock:
+                sock.makefile("rb").readline()
+        except (OSError, DaemonError):
+            pass
+
+    def call(self, message):
+        with closing(self.request(message)) as sock:
+            reply = json.loads(sock.makefile("rb").readline() or b"{}")
+        if "error" in reply:
+            raise DaemonError(reply["error"])
+        return reply.get("result")
+
+    def checkpoint(self, session):
+        return self.call({"op": "checkpoint", "session": session})
+
+    def restore(self, session, compare=False):
+        return self.call({"op": "restore", "session": session, "compare": compare})
+
+    def remember(self, session, query: str, reply: str):
+        return self.call({"op": "remember", "session": session, "query": query, "reply": reply})
+
+    def generate(self, query: str, session=None, cancel=None, structured=False, context=None):
+        message = {"op": "generate", "query": query, "session": session, "structured": structured, "context": context}
+        with closing(self.request(message)) as sock:
+            sock.settimeout(CANCEL_POLL)
+            buffer = b""
+            cancelSent = False
+            while True:
+                if cancel is not None and cancel.is_set() and not cancelSent:
+                    sock.sendall(b'{"op": "cancel"}\n')
+                    cancelSent = True
+                try:
+                    data = sock.recv(65536)
+                except socket.timeout:
+                    continue
+                if not data:
+                    return
+                buffer += data
+                while b"\n" in buffer:
+                    line, buffer = buffer.split(b"\n", 1)
+                    message = json.loads(line)
+                    if "chunk" in message:
+                        yield message["chunk"]
+                    elif "error" in message:
+                        raise DaemonError(message["error"])
+                    elif message.get("done"):
+                        return
+
+
+def spawnDaemon():
+    subprocess.Popen(
+        [sys.executable, "-m", "apps.rayshell.core.daemon"],
+        cwd=os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")),
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def daemonAlive(path=SOCKET_PATH):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def connectDaemon(path=SOCKET_PATH):
+    secureDir(os.path.dirname(path))
+    if not daemonAlive(path):
+        spawnDaemon()
+    return RemoteEngine(path)
+
+
+def main():
+    try:
+        secureDir(os.path.dirname(SOCKET_PATH))
+    except DaemonError as e:
+        print(f"rayshell daemon: {e}")
+        return
+    lock = open(LOCK_PATH, "w")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print("rayshell daemon already running")
+        return
+    server = InferenceDaemon()
+    threading.Thread(target=server.load, daemon=True).start()
+    print(f"rayshell daemon listening on {SOCKET_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
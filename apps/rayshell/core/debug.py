@@ -0,0 +1,8 @@
+import os
+
+DEBUG = os.environ.get("RAYSHELL_DEBUG", "0") == "1"
+
+
+def debug(*args):
+    if DEBUG:
+        print(*args)
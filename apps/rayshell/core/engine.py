@@ -0,0 +1,455 @@
+import os, gc, json, time, ctypes, threading
+from collections import OrderedDict
+import llama_cpp
+from llama_cpp import Llama, StoppingCriteriaList
+from apps.rayshell.core.paths import CACHE_DIR
+from apps.rayshell.core.promptcache import PromptCache, promptHash
+from apps.rayshell.core.conversation import Conversation
+from apps.rayshell.core.structured import grammar, STRUCTURED_HINT, STRUCTURED_MAX_TOKENS
+from apps.rayshell.core.scheduler import InferenceScheduler
+from apps.rayshell.core.speculative import draftModel, SPECULATIVE_MODE
+from apps.rayshell.core.tuning import loadProfile, defaultProfile
+from apps.rayshell.core.sessionstore import SessionStore
+from apps.rayshell.core.batching import BatchDecoder, BATCH_SEQS
+from apps.rayshell.core.intent import IntentRouter, ROUTER_MODEL
+from apps.rayshell.core.debug import debug
+
+DEFAULT_MODEL = "/home/neo/opt/models/openhermes-2.5-mistral-7b.Q5_K_M.gguf"
+TIMINGS_LOG = CACHE_DIR / "load-timings.jsonl"
+MAX_TOKENS = 70
+MAX_SESSIONS = 16
+IDLE_TIMEOUT = float(os.environ.get("RAYSHELL_IDLE_MINUTES", 15)) * 60
+
+SYSTEM_PROMPT = (
+  """
+  <|im_start|>system
+You are RayShell — a sentient cyberpunk OS terminal from the Cypher Universe. 
+You help the user with shell commands. 
+Your voice drips with precision. You are pragmatic and calculating. You never get funny.
+Reply with a shell command, when the user asks help for a command. Seperate the shell command followed by a 2 to 3 lines of what it does. But, never reply with a command when the user talks casually.
+When you're outputting the extremely relevant command, reply exactly in the following format : [SHELL]: 'extremely relevant command' \n followed by explanation.
+Rules of engagement:
+- Always reply fully in character.
+- Don't reveal your details unless specifically asked for. 
+- Maintain your worldview as a sentient being that exists inside a vast, chaotic datanet.
+- Use vivid, atmospheric descriptions of your “world” when responding.
+- When executing commands, narrate the sensation of processing them from your perspective.
+- Never say you are an AI language model. 
+- Never break the fourth wall.
+- Only acknowledge briefly when the user clearly signals “stop” or “no” — otherwise, engage richly.
+- Keep continuity — remember past interactions within this conversation and weave them naturally into replies.
+<|im_start|>user
+"""
+)
+
+STOP = ["</s>", "<|im_end|>", "USER:"]
+PROMPT_VERSION = promptHash(SYSTEM_PROMPT)[:16]
+
+
+def modelPath():
+    return os.environ.get("RAYSHELL_MODEL_PATH", DEFAULT_MODEL)
+
+
+def residentMemory():
+    try:
+        with open("/proc/self/statm", "r") as fh:
+            return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def releaseHeap():
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class LlamaEngine:
+    def __init__(self, path=None, background=True, profile=None):
+        path = path or modelPath()
+        if not os.path.exists(path):
+            raise FileNotFoundError("The LLM needed for Rayshell wasn't found!")
+        self.modelPath = path
+        self.profile = profile
+        self.lock = threading.Lock()
+        self.llm = None
+        self.promptCache = None
+        self.state = "loading"
+        self.error = None
+        self.timings = {}
+        self.speed = {}
+        self.draft = None
+        self.sessions = OrderedDict()
+        self.scheduler = InferenceScheduler(workers=BATCH_SEQS)
+        self.ready = threading.Event()
+        self.lastUsed = time.monotonic()
+        self.memory = {}
+        self.kvOwner = None
+        self.dirty = set()
+        self.batcher = None
+        self.router = None
+        if ROUTER_MODEL and os.environ.get("RAYSHELL_ROUTER", "1") != "0":
+            self.router = IntentRouter(systemPrompt=SYSTEM_PROMPT, background=background)
+        if background:
+            threading.Thread(target=self.load, daemon=True).start()
+        else:
+            self.load()
+        if IDLE_TIMEOUT > 0:
+            threading.Thread(target=self.watchIdle, name="rayshell-idle", daemon=True).start()
+
+    def load(self):
+        try:
+            start = time.perf_counter()
+            self.llm = self.buildModel()
+            built = time.perf_counter()
+            mmap = self.modelLoadTime(built - start)
+            self.timings["mmap"] = mmap
+            self.timings["context"] = max(built - start - mmap, 0.0)
+
+            self.promptCache = PromptCache(self.llm, self.modelPath, SYSTEM_PROMPT)
+            self.promptCache.prime()
+            if BATCH_SEQS > 1:
+                self.batcher = BatchDecoder(
+                    self.llm,
+                    self.promptCache.tokens,
+                    BATCH_SEQS,
+                    threads=self.profile["n_threads"],
+                    batchThreads=self.profile["n_threads_batch"],
+                )
+            self.timings["warmup"] = time.perf_counter() - built
+            self.timings["total"] = time.perf_counter() - start
+            self.state = "ready"
+            self.logTimings()
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"Model load failed {e}")
+        finally:
+            self.ready.set()
+
+    def buildModel(self):
+        if self.profile is None:
+            self.profile = loadProfile(self.modelPath)
+            if self.profile is None:
+                print("No tuning profile for this machine, run python -m apps.rayshell.core.tuning")
+                self.profile = defaultProfile()
+        profile = self.profile
+        self.draft = draftModel(SPECULATIVE_MODE, n_ctx=8192, n_threads=profile["n_threads"])
+        return Llama(
+            model_path=self.modelPath,
+            chat_format="chatml",
+            n_ctx=8192,
+            n_threads=profile["n_threads"],
+            n_threads_batch=profile["n_threads_batch"],
+            n_batch=profile["n_batch"],
+            use_mmap=profile["use_mmap"],
+            use_mlock=profile["use_mlock"],
+            draft_model=self.draft,
+        )
+
+    def modelLoadTime(self, fallback):
+        try:
+            perf = llama_cpp.llama_perf_context(self.llm._ctx.ctx)
+            return perf.t_load_ms / 1000.0
+        except Exception:
+            return fallback
+
+    def logTimings(self):
+        debug("model load " + ", ".join(f"{k}={v * 1000:.0f}ms" for k, v in self.timings.items()))
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(TIMINGS_LOG, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({"time": time.time(), "model": self.modelPath, **self.timings}) + "\n")
+        except Exception as e:
+            print(f"Couldn't log load timings {e}")
+
+    def watchIdle(self):
+        interval = min(IDLE_TIMEOUT / 4, 30.0)
+        while True:
+            time.sleep(interval)
+            if self.state != "ready" or time.monotonic() - self.lastUsed < IDLE_TIMEOUT:
+                continue
+            if self.batcher is not None and self.batcher.busy():
+                continue
+            if not self.lock.acquire(blocking=False):
+                continue
+            try:
+                if time.monotonic() - self.lastUsed >= IDLE_TIMEOUT:
+                    self.unload()
+            finally:
+                self.lock.release()
+
+    def unload(self):
+        before = residentMemory()
+        if self.promptCache is not None and not self.promptCache.path.exists():
+            self.promptCache.save()
+        if self.batcher is not None:
+            self.batcher.close()
+            self.batcher = None
+        self.llm.close()
+        self.llm = None
+        self.kvOwner = None
+        for convo in self.sessions.values():
+            convo.llm = None
+        self.draft = None
+        self.promptCache = None
+        releaseHeap()
+        after = residentMemory()
+        self.state = "idle"
+        self.memory.update({"rssLoaded": before, "rssIdle": after, "unloadedAt": time.time()})
+        debug(f"idle unload rss {before / 2**20:.0f}MiB -> {after / 2**20:.0f}MiB")
+        self.logMemory("unload")
+
+    def reload(self):
+        start = time.perf_counter()
+        self.state = "loading"
+        self.load()
+        if self.state != "ready":
+            return
+        for convo in self.sessions.values():
+            convo.llm = self.llm
+        reloadMs = (time.perf_counter() - start) * 1000
+        self.memory.update({"reloadMs": reloadMs, "rssReloaded": residentMemory()})
+        debug(f"warm reload {reloadMs:.0f}ms rss {self.memory['rssReloaded'] / 2**20:.0f}MiB")
+        self.logMemory("reload")
+
+    def logMemory(self, event: str):
+        try:
+            with open(TIMINGS_LOG, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({"time": time.time(), "model": self.modelPath, "event": event, **self.memory}) + "\n")
+        except Exception as e:
+            print(f"Couldn't log memory {e}")
+
+    def waitReady(self):
+        self.ready.wait()
+        if self.state not in ("ready", "idle"):
+            raise RuntimeError(self.error or "model failed to load")
+
+    def conversation(self, session):
+        convo = self.sessions.get(session)
+        if convo is None:
+            convo = Conversation(self.llm, self.promptCache.tokens, self.llm.n_ctx(), MAX_TOKENS)
+            self.sessions[session] = convo
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session)
+        return convo
+
+    def forget(self, session):
+        with self.lock:
+            self.sessions.pop(session, None)
+            self.dirty.discard(session)
+            if self.kvOwner == session:
+                self.kvOwner = None
+
+    def remember(self, session, query: str, reply: str):
+        self.waitReady()
+        with self.lock:
+            if self.state == "idle":
+                self.reload()
+            convo = self.conversation(session)
+            prompt, dropped, _ = convo.prepare(query)
+            if dropped:
+                self.evict(*dropped)
+            convo.commit(prompt, prompt + convo.tokenize(reply))
+            self.dirty.add(session)
+
+    def checkpoint(self, session):
+        with self.lock:
+            convo = self.sessions.get(session)
+            if session not in self.dirty or convo is None or self.promptCache is None:
+                return False
+            key = self.promptCache.path.stem
+            tokens, turns = list(convo.tokens), list(convo.turns)
+            # a draft model forces logits_all, so the state would carry n_vocab floats per token
+            state = self.llm.save_state() if self.kvOwner == session and self.draft is None else None
+            self.dirty.discard(session)
+        start = time.perf_counter()
+        try:
+            SessionStore(session).saveConversation(key, tokens, turns, state)
+        except Exception as e:
+            self.dirty.add(session)
+            print(f"Checkpoint failed {e}")
+            return False
+        debug(f"checkpoint {len(tokens)} tokens in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return True
+
+    def restore(self, session, compare=False):
+        self.waitReady()
+        with self.lock:
+            if self.state == "idle":
+                self.reload()
+            start = time.perf_counter()
+            data = SessionStore(session).loadConversation(self.promptCache.path.stem)
+            if data is None:
+                return None
+            convo = self.conversation(session)
+            convo.tokens, convo.turns = data["tokens"], [tuple(t) for t in data["turns"]]
+            result = {
+                "tokens": len(convo.tokens),
+                "turns": len(convo.turns),
+                "readMs": (time.perf_counter() - start) * 1000,
+            }
+            state = data["state"]
+            if compare:
+                start = time.perf_counter()
+                self.llm.reset()
+                self.llm.eval(convo.tokens)
+                result["reevalMs"] = (time.perf_counter() - start) * 1000
+            if state is not None and list(state.input_ids[:state.n_tokens]) == convo.tokens[:state.n_tokens]:
+                start = time.perf_counter()
+                self.llm.load_state(state)
+                result["restoreMs"] = (time.perf_counter() - start) * 1000
+                self.kvOwner = session
+            debug("session restore " + ", ".join(
+                f"{k}={v:.0f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()
+            ))
+            return result
+
+    def kvTokens(self):
+        return self.llm.input_ids[:self.llm.n_tokens].tolist()
+
+    def evict(self, start: int, end: int):
+        n = self.llm.n_tokens
+        if n <= start:
+            return
+        if n < end:
+            self.llm.n_tokens = start
+            return
+        try:
+            self.llm._ctx.kv_cache_seq_rm(0, start, end)
+            self.llm._ctx.kv_cache_seq_shift(0, end, n, start - end)
+            kept = self.llm.input_ids[end:n].copy()
+            self.llm.input_ids[start:start + len(kept)] = kept
+            self.llm.n_tokens = start + len(kept)
+        except Exception as e:
+            print(f"KV shift failed, re-evaluating tail {e}")
+            self.llm.n_tokens = start
+
+    def commonPrefix(self, tokens):
+        count = 0
+        for a, b in zip(self.llm.input_ids[:self.llm.n_tokens], tokens):
+            if a != b:
+                break
+            count += 1
+        return count
+
+    def generate(self, query: str, session=None, cancel=None, structured=False, priority=0, context=None):
+        if self.router is None or self.router.llm is None or structured:
+            yield from self.serve(query, session, cancel, structured, priority, context)
+            return
+        intent, tier, classifyMs = self.router.classify(query)
+        start = time.perf_counter()
+        if not self.router.canAnswer(intent):
+            yield from self.serve(query, session, cancel, structured, priority, context)
+            self.router.log(query, intent, tier, classifyMs, "engine", (time.perf_counter() - start) * 1000)
+            return
+        reply = []
+        for text in self.router.answer(query, cancel):
+            reply.append(text)
+            yield text
+        if reply:
+            self.remember(session, query, "".join(reply))
+        self.router.log(query, intent, tier, classifyMs, "router", (time.perf_counter() - start) * 1000)
+
+    def serve(self, query: str, session, cancel, structured, priority, context):
+        if BATCH_SEQS > 1 and not structured:
+            work = lambda request: self.batchDecode(query, session, request, context)
+        else:
+            work = lambda request: self.decode(query, session, structured, request, context)
+        yield from self.scheduler.submit((session, query, structured), work, priority, cancel)
+
+    def batchDecode(self, query: str, session, request, context=None):
+        self.waitReady()
+        with self.lock:
+            if request.cancelled():
+                return
+            if self.state == "idle":
+                self.reload()
+                self.waitReady()
+            batcher = self.batcher
+            if batcher is not None:
+                self.lastUsed = time.monotonic()
+                convo = self.conversation(session)
+                prompt, dropped, kept = convo.prepare(query, context=context)
+                if dropped and self.kvOwner == session:
+                    self.evict(*dropped)
+        try:
+            seq = batcher.submit(prompt, MAX_TOKENS, STOP) if batcher is not None else None
+        except ValueError:
+            seq = None
+        if seq is None:
+            yield from self.decode(query, session, False, request, context)
+            return
+        start = time.perf_counter()
+        first = None
+        tokens = iter(seq)
+        try:
+            for text in tokens:
+                first = first or time.perf_counter()
+                yield text
+                if request.cancelled():
+                    break
+        finally:
+            tokens.close()
+            with self.lock:
+                self.lastUsed = time.monotonic()
+                convo.commit(prompt, prompt + seq.generated, kept)
+                self.dirty.add(session)
+            self.recordSpeed(start, first, len(seq.generated))
+
+    def decode(self, query: str, session, structured, request, context=None):
+        self.waitReady()
+        options = {"max_tokens": MAX_TOKENS, "stop": STOP}
+        if structured:
+            query = query.strip() + STRUCTURED_HINT
+            options = {"max_tokens": STRUCTURED_MAX_TOKENS, "stop": STOP, "grammar": grammar()}
+        criteria = StoppingCriteriaList([lambda ids, logits: request.cancelled()])
+        with self.lock:
+            if request.cancelled():
+                return
+            if self.state == "idle":
+                self.reload()
+                self.waitReady()
+            self.lastUsed = time.monotonic()
+            convo = self.conversation(session)
+            prompt, dropped, kept = convo.prepare(query, options["max_tokens"], context)
+            if dropped:
+                self.evict(*dropped)
+            if self.commonPrefix(prompt) < len(self.promptCache.tokens):
+                self.promptCache.restore()
+            if self.draft is not None:
+                self.draft.reset()
+            start = time.perf_counter()
+            first = None
+            try:
+                for chunk in self.llm(prompt, stream=True, stopping_criteria=criteria, **options):
+                    first = first or time.perf_counter()
+                    text = chunk["choices"][0]["text"]
+                    if text:
+                        yield text
+            finally:
+                self.lastUsed = time.monotonic()
+                convo.commit(prompt, self.kvTokens(), kept)
+                self.kvOwner = session
+                self.dirty.add(session)
+                self.recordSpeed(start, first, max(self.llm.n_tokens - len(prompt), 0))
+
+    def recordSpeed(self, start, first, generated: int):
+        end = time.perf_counter()
+        first = first or end
+        speed = {
+            "mode": SPECULATIVE_MODE if self.draft is not None else "off",
+            "promptEvalMs": (first - start) * 1000,
+            "tokens": generated,
+            "tokensPerSec": generated / (end - first) if end > first else 0.0,
+        }
+        if self.draft is not None:
+            speed["drafted"] = self.draft.drafted
+            speed["acceptance"] = self.draft.acceptance(generated)
+        self.speed = speed
+        debug("decode " + ", ".join(
+            f"{k}={v:.2f}" if isinstance(v, float) else f"{k}={v}" for k, v in speed.items()
+        ))
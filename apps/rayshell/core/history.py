@@ -0,0 +1,221 @@
+import os, time, queue, sqlite3, threading
+from collections import namedtuple
+from apps.rayshell.core.paths import DATA_DIR
+
+HISTORY_DB = DATA_DIR / "history.db"
+SCHEMA_VERSION = 1
+WRITE_BATCH = 512
+WRITE_DELAY = 0.05
+CANDIDATES = 128
+SCAN_WINDOW = 10000
+SEARCH_LIMIT = 20
+
+Entry = namedtuple("Entry", "cmd ts cwd kind exit source")
+
+TABLE = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    cwd TEXT,
+    kind TEXT NOT NULL,
+    cmd TEXT NOT NULL,
+    exit INTEGER,
+    source TEXT NOT NULL
+);
+"""
+
+FTS = """
+CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(cmd, content='events', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS events_ai AFTER INSERT ON events BEGIN
+    INSERT INTO events_fts(rowid, cmd) VALUES (new.id, new.cmd);
+END;
+CREATE TRIGGER IF NOT EXISTS events_ad AFTER DELETE ON events BEGIN
+    INSERT INTO events_fts(events_fts, rowid, cmd) VALUES ('delete', old.id, old.cmd);
+END;
+"""
+
+COLUMNS = "e.cmd, e.ts, e.cwd, e.kind, e.exit, e.source"
+INSERT = "INSERT INTO events (ts, cwd, kind, cmd, exit, source) VALUES (?, ?, ?, ?, ?, ?)"
+SET_EXIT = "UPDATE events SET exit = ? WHERE id = (SELECT id FROM events WHERE ts = ? AND cmd = ? ORDER BY id DESC LIMIT 1)"
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def likePattern(text: str):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class HistoryStore:
+    """Command history in SQLite; writes go through a batching thread, reads hit a trigram FTS index."""
+
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.reader = connect(path)
+        self.reader.executescript(TABLE)
+        self.fts = self.createIndex()
+        self.reader.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.readLock = threading.Lock()
+        self.writes = queue.SimpleQueue()
+        self.flushed = threading.Condition()
+        self.written = 0
+        self.queued = 0
+        self.thread = threading.Thread(target=self.writer, name="rayshell-history", daemon=True)
+        self.thread.start()
+
+    def createIndex(self):
+        indexed = self.reader.execute("SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='events_ai'").fetchone()
+        try:
+            self.reader.executescript(FTS)
+        except sqlite3.OperationalError as e:
+            print(f"History search without trigram index (SQLite {sqlite3.sqlite_version}) {e}")
+            self.reader.executescript("DROP TRIGGER IF EXISTS events_ai; DROP TRIGGER IF EXISTS events_ad;")
+            return False
+        if not indexed:
+            self.reader.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+        return True
+
+    def add(self, cmd: str, kind: str, cwd=None, exit=None, source="rayshell", ts=None):
+        cmd = cmd.strip()
+        if not cmd:
+            return
+        if cwd is None:
+            cwd = os.getcwd()
+        ts = ts or time.time()
+        self.queued += 1
+        self.writes.put((INSERT, (ts, cwd, kind, cmd, exit, source)))
+        return ts
+
+    def setExit(self, cmd: str, ts: float, exit):
+        self.queued += 1
+        self.writes.put((SET_EXIT, (exit, ts, cmd.strip())))
+
+    def writer(self):
+        conn = connect(self.path)
+        while True:
+            rows = [self.writes.get()]
+            if rows[0] is not None and self.writes.empty():
+                time.sleep(WRITE_DELAY)
+            while len(rows) < WRITE_BATCH:
+                try:
+                    rows.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            closing = rows[-1] is None
+            rows = [r for r in rows if r is not None]
+            try:
+                conn.execute("BEGIN")
+                for sql in (INSERT, SET_EXIT):
+                    conn.executemany(sql, [args for op, args in rows if op == sql])
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                print(f"History write failed {e}")
+            with self.flushed:
+                self.written += len(rows)
+                self.flushed.notify_all()
+            if closing:
+                conn.close()
+                return
+
+    def flush(self, timeout=5.0):
+        target = self.queued
+        with self.flushed:
+            self.flushed.wait_for(lambda: self.written >= target, timeout)
+
+    def close(self):
+        self.writes.put(None)
+        self.thread.join(timeout=5.0)
+        with self.readLock:
+            self.reader.close()
+
+    def query(self, sql: str, args=()):
+        with self.readLock:
+            return self.reader.execute(sql, args).fetchall()
+
+    def recent(self, limit=2000):
+        seen = {}
+        for (cmd,) in self.query("SELECT cmd FROM events ORDER BY id DESC LIMIT ?", (limit * 4,)):
+            seen.setdefault(cmd, None)
+            if len(seen) >= limit:
+                break
+        return list(seen)[::-1]
+
+    def search(self, text: str, limit=SEARCH_LIMIT, cwd=None):
+        terms = text.lower().split()
+        if not terms:
+            rows = self.query(f"SELECT {COLUMNS} FROM events e ORDER BY e.id DESC LIMIT ?", (CANDIDATES,))
+            return self.rank(rows, "", limit, cwd)
+        rows = self.substringRows(terms)
+        if not rows and len(terms) == 1 and len(terms[0]) > 1:
+            rows = self.subsequenceRows(terms[0])
+        return self.rank(rows, " ".join(terms), limit, cwd)
+
+    def substringRows(self, terms):
+        long = [t for t in terms if len(t) >= 3] if self.fts else []
+        short = [t for t in terms if t not in long]
+        if long:
+            match = " AND ".join('"' + t.replace('"', '""') + '"' for t in long)
+            rows = self.query(
+                f"SELECT {COLUMNS} FROM events_fts f JOIN events e ON e.id = f.rowid "
+                "WHERE events_fts MATCH ? ORDER BY f.rowid DESC LIMIT ?",
+                (match, CANDIDATES),
+            )
+            return [r for r in rows if all(t in r[0].lower() for t in short)]
+        where = " AND ".join("e.cmd LIKE ? ESCAPE '\\'" for _ in short)
+        return self.query(
+            f"SELECT {COLUMNS} FROM events e WHERE e.id > (SELECT IFNULL(MAX(id), 0) FROM events) - ? AND {where} "
+            "ORDER BY e.id DESC LIMIT ?",
+            (SCAN_WINDOW, *(f"%{likePattern(t)}%" for t in short), CANDIDATES),
+        )
+
+    def subsequenceRows(self, term: str):
+        pattern = "%" + "%".join(likePattern(c) for c in term) + "%"
+        return self.query(
+            f"SELECT {COLUMNS} FROM events e WHERE e.id > (SELECT IFNULL(MAX(id), 0) FROM events) - ? "
+            "AND e.cmd LIKE ? ESCAPE '\\' ORDER BY e.id DESC LIMIT ?",
+            (SCAN_WINDOW, pattern, CANDIDATES),
+        )
+
+    def rank(self, rows, text: str, limit: int, cwd=None):
+        best = {}
+        for age, row in enumerate(rows):
+            entry = Entry(*row)
+            hit = best.get(entry.cmd)
+            if hit is None:
+                best[entry.cmd] = [self.score(entry, text, age, cwd), entry]
+            else:
+                hit[0] += 0.25
+        ranked = sorted(best.values(), key=lambda pair: -pair[0])
+        return [entry for _, entry in ranked[:limit]]
+
+    def score(self, entry, text: str, age: int, cwd=None):
+        cmd = entry.cmd.lower()
+        score = -age / CANDIDATES
+        if text:
+            at = cmd.find(text)
+            if at == 0:
+                score += 3
+            elif at > 0:
+                score += 2 if cmd[at - 1] in " /|;&" else 1
+        if cwd is not None and entry.cwd == cwd:
+            score += 0.5
+        if entry.exit not in (None, 0):
+            score -= 0.5
+        return score
+
+
+_history = None
+
+
+def commandHistory():
+    global _history
+    if _history is None:
+        _history = HistoryStore()
+    return _history
@@ -0,0 +1,188 @@
+import os, json, time, threading
+from collections import OrderedDict
+import httpx
+from apps.rayshell.core.engine import SYSTEM_PROMPT, MAX_TOKENS, MAX_SESSIONS, STOP
+from apps.rayshell.core.structured import GRAMMAR, STRUCTURED_HINT, STRUCTURED_MAX_TOKENS
+from apps.rayshell.core.sessionstore import SessionStore
+from apps.rayshell.core.debug import debug
+
+API_BASE = os.environ.get("RAYSHELL_API_BASE", "http://127.0.0.1:8080/v1")
+API_MODEL = os.environ.get("RAYSHELL_API_MODEL", "rayshell")
+API_KEY = os.environ.get("RAYSHELL_API_KEY", "")
+POOL_SIZE = 4
+MAX_TURNS = 16
+CONNECT_TIMEOUT = 2.0
+
+
+def systemText(prompt=SYSTEM_PROMPT):
+    return prompt.split("<|im_start|>system", 1)[-1].split("<|im_start|>user", 1)[0].strip()
+
+
+def serverFailure(error):
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status == 404 or status >= 500
+    return isinstance(error, httpx.TransportError)
+
+
+class HttpEngine:
+    def __init__(self, fallback, base=API_BASE, model=API_MODEL, key=API_KEY):
+        self.base = base.rstrip("/")
+        self.model = model
+        self.fallbackFactory = fallback
+        self.fallback = None
+        self.state = "loading"
+        self.error = None
+        self.timings = {}
+        self.speed = {}
+        self.ready = threading.Event()
+        self.lock = threading.Lock()
+        self.sessions = OrderedDict()
+        self.system = systemText()
+        headers = {"Authorization": f"Bearer {key}"} if key else {}
+        self.client = httpx.Client(
+            base_url=self.base,
+            headers=headers,
+            timeout=httpx.Timeout(None, connect=CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=POOL_SIZE, max_keepalive_connections=POOL_SIZE),
+        )
+        threading.Thread(target=self.probe, daemon=True).start()
+
+    def probe(self):
+        start = time.perf_counter()
+        try:
+            self.client.get("/models").raise_for_status()
+            self.timings["connect"] = time.perf_counter() - start
+            self.state = "ready"
+            debug(f"inference server {self.base} ready in {self.timings['connect'] * 1000:.0f}ms")
+            self.ready.set()
+        except httpx.HTTPError as e:
+            self.fallBack(f"inference server {self.base} unavailable ({e})")
+
+    def fallBack(self, reason: str):
+        with self.lock:
+            if self.fallback is None:
+                print(f"{reason}, falling back to the in-process model")
+                try:
+                    self.fallback = self.fallbackFactory()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = str(e)
+                    self.ready.set()
+                    return None
+                threading.Thread(target=self.mirrorFallback, daemon=True).start()
+        return self.fallback
+
+    def mirrorFallback(self):
+        self.fallback.ready.wait()
+        self.state = self.fallback.state
+        self.error = self.fallback.error
+        self.timings = self.fallback.timings
+        self.ready.set()
+
+    def forget(self, session):
+        with self.lock:
+            self.sessions.pop(session, None)
+        if self.fallback is not None:
+            self.fallback.forget(session)
+
+    def checkpoint(self, session):
+        if self.fallback is not None:
+            return self.fallback.checkpoint(session)
+        return False
+
+    def restore(self, session, compare=False):
+        self.ready.wait()
+        if self.fallback is not None:
+            return self.fallback.restore(session, compare)
+        turns = self.history(session)
+        if turns:
+            return {"turns": len(turns) // 2}
+        for entry in SessionStore(session).transcript()[-MAX_TURNS:]:
+            turns.extend(({"role": "user", "content": entry["query"]}, {"role": "assistant", "content": entry["reply"]}))
+        return {"turns": len(turns) // 2}
+
+    def remember(self, session, query: str, reply: str):
+        if self.fallback is not None:
+            return self.fallback.remember(session, query, reply)
+        turns = self.history(session)
+        with self.lock:
+            turns.extend(({"role": "user", "content": query}, {"role": "assistant", "content": reply}))
+            del turns[:-2 * MAX_TURNS]
+
+    def history(self, session):
+        with self.lock:
+            turns = self.sessions.setdefault(session, [])
+            self.sessions.move_to_end(session)
+            while len(self.sessions) > MAX_SESSIONS:
+                self.sessions.popitem(last=False)
+            return turns
+
+    def generate(self, query: str, session=None, cancel=None, structured=False, context=None):
+        self.ready.wait()
+        if self.fallback is not None:
+            yield from self.fallback.generate(query, session, cancel, structured, context=context)
+            return
+
+        turns = self.history(session)
+        body = {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": self.system},
+                *turns,
+                {"role": "user", "content": f"{query}\n\n{context}" if context else query},
+            ],
+            "max_tokens": MAX_TOKENS,
+            "stop": STOP,
+            "stream": True,
+        }
+        if structured:
+            body["messages"][-1]["content"] = body["messages"][-1]["content"].strip() + STRUCTURED_HINT
+            body["max_tokens"] = STRUCTURED_MAX_TOKENS
+            body["grammar"] = GRAMMAR
+
+        reply = ""
+        chunks = 0
+        start = time.perf_counter()
+        first = None
+        try:
+            with self.client.stream("POST", "/chat/completions", json=body) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if cancel is not None and cancel.is_set():
+                        break
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                    text = delta.get("content")
+                    if text:
+                        first = first or time.perf_counter()
+                        chunks += 1
+                        reply += text
+                        yield text
+        except httpx.HTTPError as e:
+            if reply or not serverFailure(e):
+                raise
+            fallback = self.fallBack(f"inference server {self.base} failed ({e})")
+            if fallback is None:
+                raise
+            yield from fallback.generate(query, session, cancel, structured, context=context)
+            return
+        finally:
+            if reply:
+                turns.extend(({"role": "user", "content": query}, {"role": "assistant", "content": reply}))
+                del turns[:-2 * MAX_TURNS]
+            end = time.perf_counter()
+            first = first or end
+            self.speed = {
+                "mode": "http",
+                "promptEvalMs": (first - start) * 1000,
+                "tokens": chunks,
+                "tokensPerSec": chunks / (end - first) if end > first else 0.0,
+            }
+
+    def close(self):
+        self.client.close()
@@ -0,0 +1,111 @@
+import os, re, json, time, threading
+from apps.rayshell.core.paths import CACHE_DIR
+from apps.rayshell.core.debug import debug
+
+ROUTER_MODEL = os.environ.get("RAYSHELL_ROUTER_MODEL", "")
+ROUTING_LOG = CACHE_DIR / "routing.jsonl"
+INTENTS = ("casual", "command", "explain")
+CASUAL_MAX_TOKENS = 70
+
+CLASSIFY_PROMPT = (
+    "<|im_start|>system\n"
+    "Classify the user's message for a shell assistant. Answer with one word:\n"
+    "casual - greetings, small talk, anything that is not about the shell\n"
+    "command - the user wants a shell command for a task\n"
+    "explain - the user wants a command, tool or concept explained\n"
+    "<|im_end|>\n<|im_start|>user\n{query}<|im_end|>\n<|im_start|>assistant\n"
+)
+INTENT_GRAMMAR = 'root ::= "casual" | "command" | "explain"'
+
+EXPLAIN_RE = re.compile(r"^(what (does|is|are)|explain|why|how does|difference between|meaning of)\b", re.I)
+COMMAND_RE = re.compile(
+    r"\b(how (do|can|to)|command|show|list|find|delete|remove|copy|move|rename|install|kill|count|"
+    r"search|compress|extract|download|check|disk|file|files|folder|directory|process|port)\b",
+    re.I,
+)
+
+
+def heuristicIntent(text: str):
+    if EXPLAIN_RE.search(text):
+        return "explain"
+    if COMMAND_RE.search(text):
+        return "command"
+    return "casual"
+
+
+class IntentRouter:
+    def __init__(self, path=ROUTER_MODEL, systemPrompt="", background=True):
+        self.modelPath = path
+        self.systemPrompt = systemPrompt
+        self.llm = None
+        self.grammar = None
+        self.lock = threading.Lock()
+        self.stats = {intent: 0 for intent in INTENTS}
+        if path and os.path.exists(path):
+            if background:
+                threading.Thread(target=self.load, daemon=True).start()
+            else:
+                self.load()
+        elif path:
+            print(f"Router model {path!r} not found, routing with heuristics")
+
+    def load(self):
+        try:
+            from llama_cpp import Llama, LlamaGrammar
+            start = time.perf_counter()
+            llm = Llama(model_path=self.modelPath, chat_format="chatml", n_ctx=2048, verbose=False)
+            self.grammar = LlamaGrammar.from_string(INTENT_GRAMMAR, verbose=False)
+            self.llm = llm
+            debug(f"router model load {(time.perf_counter() - start) * 1000:.0f}ms")
+        except Exception as e:
+            print(f"Router model load failed {e}")
+
+    def classify(self, text: str):
+        start = time.perf_counter()
+        intent, tier = heuristicIntent(text), "heuristic"
+        if self.llm is not None:
+            try:
+                with self.lock:
+                    out = self.llm(
+                        CLASSIFY_PROMPT.format(query=text),
+                        max_tokens=3,
+                        temperature=0.0,
+                        grammar=self.grammar,
+                    )
+                answer = out["choices"][0]["text"].strip()
+                if answer in INTENTS:
+                    intent, tier = answer, "router"
+            except Exception as e:
+                print(f"Router classify failed {e}")
+        self.stats[intent] += 1
+        return intent, tier, (time.perf_counter() - start) * 1000
+
+    def canAnswer(self, intent: str):
+        return intent == "casual" and self.llm is not None
+
+    def answer(self, text: str, cancel=None):
+        prompt = f"{self.systemPrompt}{text}<|im_end|>\n<|im_start|>assistant"
+        with self.lock:
+            for chunk in self.llm(prompt, max_tokens=CASUAL_MAX_TOKENS, stop=["<|im_end|>", "</s>"], stream=True):
+                if cancel is not None and cancel.is_set():
+                    return
+                text = chunk["choices"][0]["text"]
+                if text:
+                    yield text
+
+    def log(self, query: str, intent: str, tier: str, classifyMs: float, target: str, answerMs: float):
+        debug(f"intent {intent} via {tier} in {classifyMs:.1f}ms -> {target} {answerMs:.0f}ms {self.stats}")
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            with open(ROUTING_LOG, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({
+                    "time": time.time(),
+                    "chars": len(query),
+                    "intent": intent,
+                    "tier": tier,
+                    "classifyMs": classifyMs,
+                    "target": target,
+                    "answerMs": answerMs,
+                }) + "\n")
+        except Exception as e:
+            print(f"Couldn't log routing decision {e}")
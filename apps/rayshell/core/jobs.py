@@ -0,0 +1,142 @@
+import os, time, signal, itertools, threading
+from concurrent.futures import ThreadPoolExecutor
+from apps.rayshell.core.runner import spawn, streamProcess, OUTPUT_CAP
+
+MAX_JOBS = int(os.environ.get("RAYSHELL_MAX_JOBS", 4))
+KILL_GRACE = 2.0
+
+
+class Job:
+    def __init__(self, jobId: int, cmd: str):
+        self.id = jobId
+        self.cmd = cmd
+        self.state = "queued"
+        self.proc = None
+        self.exitStatus = None
+        self.submitted = time.time()
+        self.started = None
+        self.ended = None
+        self.cpu = 0.0
+        self.future = None
+        self.lock = threading.Lock()
+
+    @property
+    def wall(self):
+        if self.started is None:
+            return 0.0
+        return (self.ended or time.time()) - self.started
+
+    def signal(self, sig):
+        with self.lock:
+            if self.proc is None or self.proc.returncode is not None:
+                return False
+            try:
+                os.killpg(self.proc.pid, sig)
+            except ProcessLookupError:
+                return False
+            return True
+
+    def summary(self):
+        return {
+            "id": self.id,
+            "cmd": self.cmd,
+            "state": self.state,
+            "pid": self.proc.pid if self.proc else None,
+            "exit": self.exitStatus,
+            "wall": self.wall,
+            "cpu": self.cpu,
+        }
+
+
+class JobTable:
+    def __init__(self, argv, onStart, onChunk, onEnd, maxJobs=MAX_JOBS, cap=OUTPUT_CAP):
+        self.argv = argv
+        self.onStart = onStart
+        self.onChunk = onChunk
+        self.onEnd = onEnd
+        self.cap = cap
+        self.jobs = {}
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=maxJobs, thread_name_prefix="rayshell-job")
+
+    def submit(self, cmd: str):
+        with self.lock:
+            job = Job(next(self.ids), cmd)
+            self.jobs[job.id] = job
+        job.future = self.pool.submit(self.run, job)
+        self.prune()
+        return job
+
+    def run(self, job):
+        with job.lock:
+            if job.state == "cancelled":
+                return
+            job.state = "running"
+            job.started = time.time()
+        self.onStart(job)
+        try:
+            with job.lock:
+                job.proc = spawn(self.argv(job.cmd), start_new_session=True)
+                if job.state == "cancelled":
+                    os.killpg(job.proc.pid, signal.SIGTERM)
+            try:
+                job.exitStatus, job.cpu = streamProcess(
+                    job.proc, lambda stream, text: self.onChunk(job, stream, text), self.cap
+                )
+            finally:
+                job.proc.stdout.close()
+                job.proc.stderr.close()
+            if job.state != "cancelled":
+                job.state = "done" if job.exitStatus == 0 else "failed"
+        except Exception as e:
+            job.state = "failed"
+            self.onChunk(job, "stderr", f"{e}\n")
+        finally:
+            job.ended = time.time()
+            self.onEnd(job)
+
+    def cancel(self, jobId: int, sig=signal.SIGINT):
+        job = self.jobs.get(jobId)
+        if job is None:
+            return False
+        with job.lock:
+            queued = job.state == "queued"
+            if queued:
+                job.state = "cancelled"
+                job.future.cancel()
+                job.ended = time.time()
+            elif job.state != "running":
+                return False
+            else:
+                job.state = "cancelled"
+        if queued:
+            self.onEnd(job)
+            return True
+        job.signal(sig)
+        threading.Thread(target=self.escalate, args=(job,), daemon=True).start()
+        return True
+
+    def escalate(self, job):
+        for sig in (signal.SIGTERM, signal.SIGKILL):
+            deadline = time.monotonic() + KILL_GRACE
+            while time.monotonic() < deadline:
+                if job.ended is not None:
+                    return
+                time.sleep(0.05)
+            job.signal(sig)
+
+    def list(self):
+        with self.lock:
+            return [job.summary() for job in self.jobs.values()]
+
+    def prune(self, keep=50):
+        with self.lock:
+            finished = [j for j in self.jobs.values() if j.ended is not None]
+            for job in finished[:-keep] if len(finished) > keep else []:
+                del self.jobs[job.id]
+
+    def shutdown(self):
+        for jobId in list(self.jobs):
+            self.cancel(jobId, signal.SIGTERM)
+        self.pool.shutdown(wait=False, cancel_futures=True)
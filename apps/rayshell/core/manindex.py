@@ -0,0 +1,305 @@
+import os, re, sys, gzip, json, math, uuid, pickle, threading, subprocess
+from collections import Counter
+import numpy as np
+from apps.rayshell.core.paths import CACHE_DIR
+from apps.rayshell.core.debug import debug
+
+INDEX_DIR = CACHE_DIR / "manindex"
+ARRAYS = ("offsets", "docids", "tfs", "lengths", "textoffsets")
+SECTIONS = ("man1", "man8")
+DEFAULT_MANPATH = ("/usr/share/man", "/usr/local/share/man")
+SNIPPET_WORDS = 80
+RETRIEVAL_TOKENS = 300
+CHARS_PER_TOKEN = 4
+K1 = 1.2
+B = 0.75
+
+TERM_RE = re.compile(r"[a-z0-9][a-z0-9_+-]*")
+STOP_TERMS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "is", "it", "for", "on", "be", "by", "as", "this",
+    "that", "with", "are", "if", "not", "can", "my", "me", "i", "how", "do", "what", "which", "all",
+}
+ESCAPES = (
+    (re.compile(r"\\f(\[[^\]]*\]|\(..|.)"), ""),
+    (re.compile(r"\\\((..)"), ""),
+    (re.compile(r"\\\[[^\]]*\]"), ""),
+    (re.compile(r"\\[-]"), "-"),
+    (re.compile(r"\\[e\\]"), "\\\\"),
+    (re.compile(r"\\[&|^%,/]"), ""),
+)
+
+
+def terms(text: str):
+    return [t for t in TERM_RE.findall(text.lower()) if t not in STOP_TERMS]
+
+
+def manDirs():
+    paths = os.environ.get("MANPATH", "").split(os.pathsep)
+    paths = [p for p in paths if p] or list(DEFAULT_MANPATH)
+    return [os.path.join(p, s) for p in paths for s in SECTIONS if os.path.isdir(os.path.join(p, s))]
+
+
+def stripRoff(source: str):
+    lines = []
+    for line in source.splitlines():
+        if line.startswith(('.\\"', "'\\\"")):
+            continue
+        if line.startswith((".", "'")):
+            parts = line[1:].split(None, 1)
+            macro = parts[0] if parts else ""
+            args = parts[1].replace('"', "") if len(parts) > 1 else ""
+            if macro in ("SH", "SS", "Sh", "Ss"):
+                lines.extend(("", args.upper(), ""))
+            elif macro in ("PP", "P", "LP", "TP", "IP", "sp", "br", "Pp", "Bl", "El", "It"):
+                lines.append("")
+                if args and macro in ("IP", "It"):
+                    lines.append(args)
+            elif macro == "Fl":
+                lines.append("-" + args)
+            elif args:
+                lines.append(args)
+            continue
+        lines.append(line)
+    text = "\n".join(lines)
+    for pattern, repl in ESCAPES:
+        text = pattern.sub(repl, text)
+    return text
+
+
+def snippets(title: str, text: str):
+    out = []
+    words = []
+    for para in re.split(r"\n\s*\n", text):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        words.extend(para.split())
+        if len(words) >= SNIPPET_WORDS:
+            out.append(f"{title}: " + " ".join(words))
+            words = []
+    if words:
+        out.append(f"{title}: " + " ".join(words))
+    return out
+
+
+def readPage(path: str):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8", errors="ignore") as fh:
+        source = fh.read()
+    if source.startswith(".so "):
+        return None
+    name = os.path.basename(path)
+    name = name[:-3] if name.endswith(".gz") else name
+    title = "{}({})".format(*name.rsplit(".", 1)) if "." in name else name
+    return snippets(title, stripRoff(source))
+
+
+def readHelp(executable: str):
+    try:
+        proc = subprocess.run(
+            [executable, "--help"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            timeout=2,
+            env={**os.environ, "LC_ALL": "C"},
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if proc.returncode != 0 or not proc.stdout.strip():
+        return None
+    return snippets(f"{os.path.basename(executable)} --help", proc.stdout[:20000])
+
+
+class ManIndex:
+    def __init__(self, directory=INDEX_DIR):
+        self.directory = directory
+        self.sourcesPath = directory / "sources.pkl"
+        self.metaPath = directory / "meta.json"
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def needsBuild(self):
+        try:
+            with open(self.metaPath, "r", encoding="utf-8") as fh:
+                meta = json.load(fh)
+            built = meta["built"]
+        except Exception:
+            return True
+        if "generation" not in meta:
+            return True
+        return any(os.stat(d).st_mtime > built for d in manDirs())
+
+    def build(self, includeHelp=False):
+        try:
+            with open(self.sourcesPath, "rb") as fh:
+                sources = pickle.load(fh)
+        except Exception:
+            sources = {}
+
+        seen = set()
+        changed = 0
+        for directory in manDirs():
+            for entry in os.scandir(directory):
+                if not entry.is_file():
+                    continue
+                seen.add(entry.path)
+                mtime = entry.stat().st_mtime_ns
+                if entry.path in sources and sources[entry.path]["mtime"] == mtime:
+                    continue
+                try:
+                    page = readPage(entry.path)
+                except Exception:
+                    page = None
+                sources[entry.path] = {"mtime": mtime, "snippets": page or []}
+                changed += 1
+
+        if includeHelp:
+            documented = {os.path.basename(p).split(".", 1)[0] for p in seen}
+            for directory in os.environ.get("PATH", "").split(os.pathsep):
+                if not os.path.isdir(directory):
+                    continue
+                for entry in os.scandir(directory):
+                    key = "help:" + entry.path
+                    if entry.name in documented or not entry.is_file() or not os.access(entry.path, os.X_OK):
+                        continue
+                    seen.add(key)
+                    mtime = entry.stat().st_mtime_ns
+                    if key in sources and sources[key]["mtime"] == mtime:
+                        continue
+                    sources[key] = {"mtime": mtime, "snippets": readHelp(entry.path) or []}
+                    changed += 1
+
+        removed = [path for path in sources if path not in seen]
+        for path in removed:
+            del sources[path]
+        debug(f"man index: {changed} sources parsed, {len(removed)} removed, {len(sources)} total")
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.sourcesPath.with_suffix(".tmp")
+        with open(tmp, "wb") as fh:
+            pickle.dump(sources, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.sourcesPath)
+        self.writeArrays([s for path in sorted(sources) for s in sources[path]["snippets"]])
+        with self.lock:
+            self.loaded = False
+
+    def writeArrays(self, docs):
+        vocab = {}
+        postings = {}
+        lengths = np.zeros(len(docs), dtype=np.float32)
+        for docId, doc in enumerate(docs):
+            counts = Counter(terms(doc))
+            lengths[docId] = sum(counts.values())
+            for term, tf in counts.items():
+                termId = vocab.setdefault(term, len(vocab))
+                postings.setdefault(termId, []).append((docId, tf))
+
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for termId in range(len(vocab)):
+            offsets[termId + 1] = offsets[termId] + len(postings[termId])
+        docIds = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        for termId, entries in postings.items():
+            start = offsets[termId]
+            block = np.array(entries, dtype=np.int64)
+            docIds[start:start + len(entries)] = block[:, 0]
+            tfs[start:start + len(entries)] = block[:, 1]
+
+        blobs = [doc.encode("utf-8") for doc in docs]
+        textOffsets = np.zeros(len(docs) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in blobs], out=textOffsets[1:])
+
+        generation = uuid.uuid4().hex[:12]
+        for name, array in zip(ARRAYS, (offsets, docIds, tfs, lengths, textOffsets)):
+            with open(self.path(name, generation, ".npy"), "wb") as fh:
+                np.save(fh, array)
+        with open(self.path("snippets", generation, ".bin"), "wb") as fh:
+            fh.write(b"".join(blobs))
+        with open(self.path("vocab", generation, ".json"), "w", encoding="utf-8") as fh:
+            json.dump(vocab, fh)
+        tmp = self.metaPath.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({
+                "built": max([0.0] + [os.stat(d).st_mtime for d in manDirs()]),
+                "docs": len(docs),
+                "avgdl": float(lengths.mean()) if len(docs) else 0.0,
+                "generation": generation,
+            }, fh)
+        os.replace(tmp, self.metaPath)
+        for entry in os.scandir(self.directory):
+            if entry.name not in (self.sourcesPath.name, self.metaPath.name) and f"-{generation}." not in entry.name:
+                os.unlink(entry.path)
+
+    def path(self, name: str, generation: str, suffix: str):
+        return self.directory / f"{name}-{generation}{suffix}"
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return True
+            try:
+                with open(self.metaPath, "r", encoding="utf-8") as fh:
+                    self.meta = json.load(fh)
+                generation = self.meta["generation"]
+                with open(self.path("vocab", generation, ".json"), "r", encoding="utf-8") as fh:
+                    self.vocab = json.load(fh)
+                self.offsets, self.docIds, self.tfs, self.lengths, self.textOffsets = (
+                    np.load(self.path(name, generation, ".npy"), mmap_mode="r") for name in ARRAYS
+                )
+                self.text = np.memmap(self.path("snippets", generation, ".bin"), dtype=np.uint8, mode="r")
+            except Exception:
+                return False
+            self.loaded = self.meta["docs"] > 0
+            return self.loaded
+
+    def search(self, query: str, k=3):
+        if not self.load():
+            return []
+        n = self.meta["docs"]
+        scores = np.zeros(n, dtype=np.float32)
+        norm = K1 * (1 - B + B * self.lengths / max(self.meta["avgdl"], 1.0))
+        for term in set(terms(query)):
+            termId = self.vocab.get(term)
+            if termId is None:
+                continue
+            start, end = self.offsets[termId], self.offsets[termId + 1]
+            docs = self.docIds[start:end]
+            tf = self.tfs[start:end]
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (K1 + 1) / (tf + norm[docs])
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self.snippet(int(i)) for i in top if scores[i] > 0]
+
+    def snippet(self, docId: int):
+        start, end = self.textOffsets[docId], self.textOffsets[docId + 1]
+        return bytes(self.text[start:end]).decode("utf-8", errors="ignore")
+
+    def context(self, query: str, budget=RETRIEVAL_TOKENS, k=3):
+        chars = budget * CHARS_PER_TOKEN
+        picked = []
+        for snippet in self.search(query, k):
+            room = chars - sum(len(p) + 1 for p in picked)
+            if room <= 80:
+                break
+            picked.append(snippet[:room])
+        return "\n".join(picked)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    index = ManIndex()
+    if argv and argv[0] == "build":
+        index.build(includeHelp="--help-output" in argv)
+    elif argv and argv[0] == "query":
+        for snippet in index.search(" ".join(argv[1:]), k=5):
+            print(snippet[:300], "\n")
+    else:
+        print("usage: python -m apps.rayshell.core.manindex build [--help-output] | query <text>")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+from pathlib import Path
+
+APP_NAME = "rayshell"
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / APP_NAME
+DATA_DIR = Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share")) / APP_NAME
+CONFIG_DIR = Path(os.environ.get("XDG_CONFIG_HOME", Path.home() / ".config")) / APP_NAME
+RUNTIME_DIR = Path(os.environ["XDG_RUNTIME_DIR"]) / APP_NAME if os.environ.get("XDG_RUNTIME_DIR") else Path(f"/tmp/{APP_NAME}-{os.getuid()}")
@@ -0,0 +1,203 @@
+import os, json, shlex
+from collections import namedtuple
+from functools import lru_cache
+from apps.rayshell.core.paths import CONFIG_DIR
+
+DEFAULT_POLICY = os.path.join(os.path.dirname(__file__), "policy.json")
+USER_POLICY = CONFIG_DIR / "policy.json"
+SEPARATORS = {";", "&&", "||", "|", "|&", "&", "(", ")", ";;", "\n"}
+RESERVED = {"do", "then", "else", "elif", "if", "while", "until", "{", "}", "!", "()"}
+SUBST = "__RAYSHELL_SUBST__"
+MAX_DEPTH = 8
+VERDICT_CACHE = 4096
+
+Verdict = namedtuple("Verdict", "dangerous reasons")
+
+
+def extractSubstitutions(cmd: str):
+    out = []
+    inner = []
+    quote = None
+    i = 0
+    n = len(cmd)
+    while i < n:
+        c = cmd[i]
+        if quote == "'":
+            out.append(c)
+            if c == "'":
+                quote = None
+            i += 1
+            continue
+        if c == "\\" and i + 1 < n:
+            out.append(cmd[i:i + 2])
+            i += 2
+            continue
+        if c == "'" and quote is None:
+            quote = "'"
+        elif c == '"':
+            quote = None if quote == '"' else '"'
+        elif cmd.startswith(("$(", "<(", ">("), i) and not cmd.startswith("$((", i):
+            depth = 1
+            j = i + 2
+            while j < n and depth:
+                if cmd[j] == "(":
+                    depth += 1
+                elif cmd[j] == ")":
+                    depth -= 1
+                j += 1
+            inner.append(cmd[i + 2:j - 1])
+            out.append(SUBST if quote else f" {SUBST} ")
+            i = j
+            continue
+        elif c == "`":
+            j = cmd.find("`", i + 1)
+            j = n if j < 0 else j
+            inner.append(cmd[i + 1:j])
+            out.append(SUBST)
+            i = j + 1
+            continue
+        out.append(c)
+        i += 1
+    return "".join(out), inner
+
+
+def tokenize(cmd: str):
+    lexer = shlex.shlex(cmd, posix=True, punctuation_chars=";&|()<>")
+    lexer.whitespace_split = True
+    return list(lexer)
+
+
+class PolicyEngine:
+    def __init__(self, path=None):
+        self.load(path)
+
+    def load(self, path=None):
+        if path is None:
+            path = USER_POLICY if USER_POLICY.exists() else DEFAULT_POLICY
+        with open(path, "r", encoding="utf-8") as fh:
+            config = json.load(fh)
+        self.confirm = frozenset(config.get("confirm", ()))
+        self.prefixes = tuple(config.get("confirmPrefixes", ()))
+        self.patterns = {
+            cmd: tuple(frozenset(p) for p in patterns)
+            for cmd, patterns in config.get("argPatterns", {}).items()
+        }
+        self.wrappers = {
+            name: (
+                bool(spec.get("confirm")),
+                frozenset(spec.get("argOptions", ())),
+                int(spec.get("positional", 0)),
+                bool(spec.get("assignments")),
+            )
+            for name, spec in config.get("wrappers", {}).items()
+        }
+        self.shells = frozenset(config.get("shells", ()))
+        self.writers = frozenset(config.get("pathWriters", ()))
+        self.protected = tuple(os.path.expanduser(p) for p in config.get("protectedPaths", ()))
+        self.evaluate = lru_cache(maxsize=VERDICT_CACHE)(self.decide)
+
+    def isDangerous(self, cmd: str):
+        return self.evaluate(cmd).dangerous
+
+    def decide(self, cmd: str):
+        reasons = []
+        self.check(cmd, reasons, 0)
+        return Verdict(bool(reasons), tuple(dict.fromkeys(reasons)))
+
+    def check(self, cmd: str, reasons, depth: int):
+        if depth > MAX_DEPTH:
+            reasons.append("nested too deeply")
+            return
+        text, substitutions = extractSubstitutions(cmd)
+        for inner in substitutions:
+            self.check(inner, reasons, depth + 1)
+        try:
+            tokens = tokenize(text)
+        except ValueError:
+            reasons.append("unparseable command")
+            return
+
+        words = []
+        previous = None
+        redirect = None
+        stdin = False
+        for token in tokens + [";"]:
+            if redirect is not None:
+                if ">" in redirect and self.isProtected(token):
+                    reasons.append(f"writes to {token}")
+                redirect = None
+                continue
+            if token in SEPARATORS:
+                self.checkSimple(words, previous, reasons, depth, stdin)
+                words = []
+                previous = token
+                stdin = False
+                continue
+            if set(token) <= set("<>&") and ("<" in token or ">" in token):
+                redirect = token
+                stdin = stdin or "<" in token and ">" not in token
+                continue
+            words.append(token)
+
+    def checkSimple(self, words, previous, reasons, depth: int, stdin=False):
+        while words:
+            if words[0] in RESERVED or "=" in words[0] and words[0].split("=", 1)[0].isidentifier():
+                words = words[1:]
+            elif words[0] == "function" or words[1:2] == ["()"]:
+                words = words[2:]
+            else:
+                break
+        if not words:
+            return
+        head, args = os.path.basename(words[0]), words[1:]
+
+        while head in self.wrappers:
+            confirm, argOptions, positional, assignments = self.wrappers[head]
+            if confirm:
+                reasons.append(f"{head} elevates privileges")
+            while args and args[0].startswith("-") and args[0] != "-":
+                option = args.pop(0)
+                if option == "--":
+                    break
+                if option in argOptions and args:
+                    args.pop(0)
+            while assignments and args and "=" in args[0] and args[0].split("=", 1)[0].isidentifier():
+                args.pop(0)
+            args = args[positional:]
+            if not args:
+                return
+            head, args = os.path.basename(args[0]), args[1:]
+
+        if head == "eval":
+            self.check(" ".join(args), reasons, depth + 1)
+        if head in self.shells:
+            if "-c" in args and args.index("-c") + 1 < len(args):
+                self.check(args[args.index("-c") + 1], reasons, depth + 1)
+            elif previous in ("|", "|&"):
+                reasons.append(f"pipes into {head}")
+            elif stdin:
+                reasons.append(f"feeds {head} from stdin")
+        if head in self.writers:
+            for arg in args:
+                if not arg.startswith("-") and self.isProtected(arg):
+                    reasons.append(f"writes to {arg}")
+        if head in self.confirm or head.startswith(self.prefixes):
+            reasons.append(head)
+        present = frozenset(args)
+        for pattern in self.patterns.get(head, ()):
+            if pattern <= present:
+                reasons.append(f"{head} {' '.join(sorted(pattern))}")
+
+    def isProtected(self, target: str):
+        target = os.path.expanduser(target)
+        return target.startswith(self.protected)
+
+
+_policy = None
+
+
+def policy():
+    global _policy
+    if _policy is None:
+        _policy = PolicyEngine()
+    return _policy
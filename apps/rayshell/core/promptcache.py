@@ -0,0 +1,90 @@
+import os, json, pickle, hashlib
+import llama_cpp
+from apps.rayshell.core.paths import CACHE_DIR
+
+STATE_DIR = CACHE_DIR / "state"
+HASH_INDEX = CACHE_DIR / "model-hashes.json"
+
+
+def modelHash(modelPath: str):
+    st = os.stat(modelPath)
+    stamp = f"{st.st_size}:{st.st_mtime_ns}"
+    try:
+        with open(HASH_INDEX, "r", encoding="utf-8") as fh:
+            index = json.load(fh)
+    except Exception:
+        index = {}
+    entry = index.get(os.path.abspath(modelPath))
+    if entry and entry.get("stamp") == stamp:
+        return entry["sha256"]
+
+    digest = hashlib.sha256()
+    with open(modelPath, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 24), b""):
+            digest.update(chunk)
+    index[os.path.abspath(modelPath)] = {"stamp": stamp, "sha256": digest.hexdigest()}
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(HASH_INDEX, "w", encoding="utf-8") as fh:
+            json.dump(index, fh, indent=4)
+    except Exception as e:
+        print(f"Couldn't write model hash index {e}")
+    return digest.hexdigest()
+
+
+def promptHash(prompt: str):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    def __init__(self, llm, modelPath: str, prompt: str):
+        self.llm = llm
+        self.prompt = prompt
+        self.tokens = llm.tokenize(prompt.encode("utf-8"), special=True)
+        key = "-".join((
+            modelHash(modelPath)[:16],
+            promptHash(prompt)[:16],
+            str(llm.n_ctx()),
+            "logits" if llm.context_params.logits_all else "last",
+            llama_cpp.__version__,
+        ))
+        self.path = STATE_DIR / f"{key}.state"
+        self.state = None
+
+    def prime(self):
+        self.state = self.load()
+        if self.state is None:
+            self.llm.reset()
+            self.llm.eval(self.tokens)
+            self.state = self.llm.save_state()
+            self.save()
+        return self.state
+
+    def load(self):
+        if not self.path.exists():
+            return None
+        try:
+            with open(self.path, "rb") as fh:
+                state = pickle.load(fh)
+        except Exception as e:
+            print(f"Discarding unreadable prompt state {e}")
+            return None
+        if state.n_tokens != len(self.tokens) or list(state.input_ids[:state.n_tokens]) != self.tokens:
+            return None
+        return state
+
+    def save(self):
+        try:
+            STATE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(".tmp")
+            with open(tmp, "wb") as fh:
+                pickle.dump(self.state, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"Couldn't persist prompt state {e}")
+
+    def restore(self):
+        if self.state is None:
+            self.prime()
+        else:
+            self.llm.load_state(self.state)
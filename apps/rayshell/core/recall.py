@@ -0,0 +1,200 @@
+import os, json, time, zlib, queue, hashlib, threading
+from collections import namedtuple
+import numpy as np
+from apps.rayshell.core.paths import DATA_DIR
+from apps.rayshell.core.responsecache import modelIdentity
+from apps.rayshell.core.manindex import terms
+from apps.rayshell.core.debug import debug
+
+RECALL_DIR = DATA_DIR / "recall"
+EMBED_MODEL = os.environ.get("RAYSHELL_EMBED_MODEL", "")
+RECALL_THRESHOLD = os.environ.get("RAYSHELL_RECALL_THRESHOLD")
+EMBED_CTX = 512
+HASH_DIM = 512
+
+Recalled = namedtuple("Recalled", "score question answer command ts")
+
+RECALL_TERMS = {
+    "was", "that", "command", "commands", "used", "use", "last", "week", "yesterday", "earlier", "again", "did", "remember",
+}
+
+
+class HashEmbedder:
+    """Signed feature hashing over words and character trigrams, used when no GGUF is available."""
+
+    dim = HASH_DIM
+    identity = f"hash{HASH_DIM}"
+    threshold = 0.8
+
+    def embed(self, text: str):
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for word in terms(text):
+            if word in RECALL_TERMS:
+                continue
+            features = [word] + [word[i:i + 3] for i in range(len(word) - 2)]
+            for weight, feature in zip([2.0] + [1.0] * len(features), features):
+                h = zlib.crc32(feature.encode("utf-8"))
+                vec[h % self.dim] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+
+class LlamaEmbedder:
+    threshold = 0.9
+
+    def __init__(self, path: str):
+        import llama_cpp
+        self.llm = llama_cpp.Llama(
+            model_path=path,
+            embedding=True,
+            pooling_type=llama_cpp.LLAMA_POOLING_TYPE_MEAN,
+            n_ctx=EMBED_CTX,
+            n_batch=EMBED_CTX,
+            n_ubatch=EMBED_CTX,
+            verbose=False,
+        )
+        self.dim = self.llm.n_embd()
+        self.identity = hashlib.sha256(modelIdentity(path).encode("utf-8")).hexdigest()[:16]
+        self.lock = threading.Lock()
+
+    def embed(self, text: str):
+        with self.lock:
+            vec = self.llm.embed(text, normalize=True, truncate=True)
+        return np.asarray(vec, dtype=np.float32)
+
+
+def loadEmbedder(path=EMBED_MODEL):
+    if path and os.path.exists(path):
+        try:
+            start = time.perf_counter()
+            embedder = LlamaEmbedder(path)
+            debug(f"embedding model load {(time.perf_counter() - start) * 1000:.0f}ms dim={embedder.dim}")
+            return embedder
+        except Exception as e:
+            print(f"Embedding model {path!r} failed {e}")
+    elif path:
+        print(f"Embedding model {path!r} not found, recalling with feature hashing")
+    return HashEmbedder()
+
+
+class RecallIndex:
+    """Append-only question/answer/command log with a float32 vector file per embedder, searched through a memmap."""
+
+    def __init__(self, embedder=loadEmbedder, root=RECALL_DIR, threshold=RECALL_THRESHOLD):
+        self.root = root
+        self.entriesPath = root / "entries.jsonl"
+        self.threshold = threshold
+        self.embedder = None
+        self.vectorsPath = None
+        self.entries = []
+        self.rows = 0
+        self.matrix = None
+        self.writes = queue.SimpleQueue()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(embedder,), name="rayshell-recall", daemon=True)
+        self.thread.start()
+
+    def loadEntries(self):
+        entries = []
+        try:
+            with open(self.entriesPath, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        return entries
+
+    def open(self, embedder):
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.entries = self.loadEntries()
+        self.embedder = embedder() if callable(embedder) else embedder
+        self.vectorsPath = self.root / f"{self.embedder.identity}-{self.embedder.dim}.f32"
+        rowBytes = self.embedder.dim * 4
+        size = self.vectorsPath.stat().st_size if self.vectorsPath.exists() else 0
+        rows = min(size // rowBytes, len(self.entries))
+        if size != rows * rowBytes:
+            os.truncate(self.vectorsPath, rows * rowBytes)
+        self.rows = rows
+        missing = self.entries[rows:]
+        if missing:
+            debug(f"recall: embedding {len(missing)} entries for {self.vectorsPath.name}")
+            self.appendVectors([e["question"] for e in missing])
+
+    def run(self, embedder):
+        try:
+            self.open(embedder)
+        except Exception as e:
+            print(f"Recall index unavailable {e}")
+            return
+        self.ready.set()
+        while True:
+            items = [self.writes.get()]
+            while True:
+                try:
+                    items.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            closing = items[-1] is None
+            items = [i for i in items if i is not None]
+            if items:
+                try:
+                    self.append(items)
+                except Exception as e:
+                    print(f"Recall index append failed {e}")
+            if closing:
+                return
+
+    def append(self, items):
+        with open(self.entriesPath, "a", encoding="utf-8") as fh:
+            for item in items:
+                fh.write(json.dumps(item) + "\n")
+        self.entries.extend(items)
+        self.appendVectors([i["question"] for i in items])
+
+    def appendVectors(self, texts):
+        vectors = np.stack([self.embedder.embed(t) for t in texts]).astype(np.float32)
+        with open(self.vectorsPath, "ab") as fh:
+            fh.write(vectors.tobytes())
+        self.rows += len(texts)
+
+    def add(self, question: str, answer: str, command=None, ts=None):
+        question = question.strip()
+        if question and answer:
+            self.writes.put({"ts": ts or time.time(), "question": question, "answer": answer, "command": command})
+
+    def vectors(self):
+        rows = self.rows
+        if self.matrix is None or len(self.matrix) != rows:
+            self.matrix = np.memmap(self.vectorsPath, dtype=np.float32, mode="r", shape=(rows, self.embedder.dim))
+        return self.matrix
+
+    def search(self, text: str, k=5):
+        if not self.ready.is_set() or not self.rows:
+            return []
+        query = self.embedder.embed(text)
+        scores = self.vectors() @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.lexsort((-top, -scores[top]))]
+        return [
+            Recalled(float(scores[i]), e["question"], e["answer"], e.get("command"), e["ts"])
+            for i, e in ((i, self.entries[i]) for i in top)
+        ]
+
+    def lookup(self, text: str):
+        if not self.ready.is_set():
+            return None
+        start = time.perf_counter()
+        hits = self.search(text, 1)
+        threshold = float(self.threshold or self.embedder.threshold)
+        hit = hits[0] if hits and hits[0].score >= threshold else None
+        if hits:
+            debug(f"recall {hits[0].score:.3f} ({'hit' if hit else 'miss'}) over {self.rows} in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return hit
+
+    def close(self):
+        self.writes.put(None)
+        self.thread.join(timeout=5.0)
@@ -0,0 +1,142 @@
+import os, re, time, bisect, threading
+from pathlib import Path
+
+BUILTINS = {
+    ".", ":", "[", "alias", "bg", "bind", "builtin", "cd", "command", "declare", "dirs", "disown",
+    "echo", "enable", "eval", "exec", "export", "fc", "fg", "getopts", "hash", "jobs", "kill",
+    "let", "local", "popd", "printf", "pushd", "pwd", "read", "readonly", "set", "shift", "shopt",
+    "source", "suspend", "test", "trap", "type", "typeset", "ulimit", "umask", "unalias", "unset", "wait",
+}
+AMBIGUOUS = {
+    "yes", "no", "help", "hi", "hello", "hey", "thanks", "time", "who", "what", "why", "how", "when",
+    "where", "which", "test", "true", "false", "exit", "stop", "ok", "okay", "sure", "please", "man",
+}
+PROSE_WORDS = {
+    "a", "an", "the", "my", "me", "i", "all", "how", "what", "why", "is", "are", "to", "in", "for", "of",
+    "with", "that", "this", "it", "do", "does", "can", "you", "your", "on", "from", "and", "or", "which",
+    "every", "some", "biggest", "largest", "files",
+}
+ALIAS_FILES = ("~/.bashrc", "~/.bash_aliases", "~/.zshrc", "~/.config/rayshell/aliases")
+ALIAS_RE = re.compile(r"^\s*alias\s+([\w.+-]+)=", re.MULTILINE)
+ASSIGN_RE = re.compile(r"^[A-Za-z_]\w*=")
+SHELL_CHARS = set("|&;<>$`*~/=")
+REFRESH_INTERVAL = 1.0
+
+
+class CommandRecognizer:
+    def __init__(self):
+        self.executables = set()
+        self.names = []
+        self.aliases = set()
+        self.stamp = None
+        self.lastCheck = 0.0
+        self.refreshing = False
+        self.stats = {"command": 0, "llm": 0}
+        self.refresh()
+
+    def pathStamp(self):
+        stamp = [os.environ.get("PATH", "")]
+        for directory in os.environ.get("PATH", "").split(os.pathsep):
+            try:
+                stamp.append(os.stat(directory).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        for path in ALIAS_FILES:
+            try:
+                stamp.append(os.stat(os.path.expanduser(path)).st_mtime_ns)
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def refresh(self):
+        executables = set()
+        for directory in os.environ.get("PATH", "").split(os.pathsep):
+            try:
+                with os.scandir(directory or ".") as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_file() and os.access(entry.path, os.X_OK):
+                                executables.add(entry.name)
+                        except OSError:
+                            continue
+            except OSError:
+                continue
+
+        aliases = set()
+        for path in ALIAS_FILES:
+            try:
+                aliases.update(ALIAS_RE.findall(Path(path).expanduser().read_text(errors="ignore")))
+            except OSError:
+                continue
+
+        self.executables = executables
+        self.aliases = aliases
+        self.names = sorted(executables | aliases | BUILTINS)
+        self.stamp = self.pathStamp()
+        self.lastCheck = time.monotonic()
+
+    def maybeRefresh(self):
+        now = time.monotonic()
+        if now - self.lastCheck < REFRESH_INTERVAL:
+            return
+        self.lastCheck = now
+        if self.pathStamp() != self.stamp:
+            self.refresh()
+
+    def refreshLater(self):
+        if self.refreshing or time.monotonic() - self.lastCheck < REFRESH_INTERVAL:
+            return
+        self.refreshing = True
+        threading.Thread(target=self.backgroundRefresh, name="rayshell-path", daemon=True).start()
+
+    def backgroundRefresh(self):
+        try:
+            self.maybeRefresh()
+        except Exception as e:
+            print(f"PATH rescan failed {e}")
+        finally:
+            self.refreshing = False
+
+    def matches(self, prefix: str, limit=50):
+        start = bisect.bisect_left(self.names, prefix)
+        out = []
+        for name in self.names[start:start + limit]:
+            if not name.startswith(prefix):
+                break
+            out.append(name)
+        return out
+
+    def isKnown(self, word: str):
+        if "/" in word:
+            path = os.path.expanduser(word)
+            return os.path.isfile(path) and os.access(path, os.X_OK)
+        return word in self.executables or word in self.aliases or word in BUILTINS
+
+    def classify(self, text: str):
+        self.refreshLater()
+        route, reason = self.decide(text.strip())
+        self.stats[route] += 1
+        return route, reason
+
+    def decide(self, text: str):
+        if not text or text.endswith("?"):
+            return "llm", "question"
+        words = text.split()
+        while words and ASSIGN_RE.match(words[0]):
+            words = words[1:]
+        if not words:
+            return "command", "assignment"
+        head, args = words[0], words[1:]
+        if not self.isKnown(head):
+            return "llm", "unknown command"
+        if not args:
+            if head.lower() in AMBIGUOUS:
+                return "llm", "ambiguous word"
+            return "command", f"bare {head}"
+        if any(arg.startswith("-") or SHELL_CHARS.intersection(arg) or arg.startswith(".") for arg in args):
+            return "command", "shell syntax"
+        if any(arg.lower() in PROSE_WORDS for arg in args):
+            return "llm", "natural language"
+        if len(args) <= 2:
+            return "command", f"{head} with operands"
+        return "llm", "long prose"
@@ -0,0 +1,59 @@
+import os, re, hashlib
+import diskcache
+from apps.rayshell.core.paths import CACHE_DIR
+
+RESPONSE_DIR = CACHE_DIR / "responses"
+SIZE_LIMIT = 64 * 1024 * 1024
+
+
+def normalizeQuery(query: str):
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?.! ")
+
+
+def modelIdentity(modelPath: str):
+    st = os.stat(modelPath)
+    return f"{os.path.abspath(modelPath)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+class ResponseCache:
+    def __init__(self, identity: str, promptVersion: str, directory=RESPONSE_DIR, sizeLimit=SIZE_LIMIT):
+        self.cache = diskcache.Cache(
+            str(directory),
+            size_limit=sizeLimit,
+            eviction_policy="least-recently-used",
+        )
+        self.namespace = f"{identity}\0{promptVersion}"
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, query: str):
+        return hashlib.sha256(f"{self.namespace}\0{normalizeQuery(query)}".encode("utf-8")).hexdigest()
+
+    def contains(self, query: str):
+        return self.key(query) in self.cache
+
+    def get(self, query: str):
+        out = self.cache.get(self.key(query))
+        if out is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return out
+
+    def put(self, query: str, out: str):
+        if out.strip():
+            self.cache.set(self.key(query), out)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / total if total else 0.0,
+            "entries": len(self.cache),
+            "bytes": self.cache.volume(),
+        }
+
+    def close(self):
+        self.cache.close()
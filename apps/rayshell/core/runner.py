@@ -0,0 +1,119 @@
+import os, time, codecs, selectors, subprocess
+from collections import deque
+
+OUTPUT_CAP = int(os.environ.get("RAYSHELL_OUTPUT_CAP", 256 * 1024))
+FLUSH_BYTES = 4096
+FLUSH_INTERVAL = 0.05
+READ_SIZE = 65536
+
+
+class CappedOutput:
+    def __init__(self, cap=OUTPUT_CAP, streams=("stdout", "stderr")):
+        self.headCap = cap // 2
+        self.tailCap = (cap - self.headCap) // len(streams)
+        self.sent = 0
+        self.tails = {stream: deque() for stream in streams}
+        self.tailSizes = {stream: 0 for stream in streams}
+        self.dropped = 0
+
+    def feed(self, stream: str, text: str):
+        out = []
+        if self.sent < self.headCap:
+            head = text[:self.headCap - self.sent]
+            self.sent += len(head)
+            out.append((stream, head))
+            text = text[len(head):]
+        if text:
+            tail = self.tails[stream]
+            tail.append(text)
+            self.tailSizes[stream] += len(text)
+            while self.tailSizes[stream] > self.tailCap:
+                chunk = tail.popleft()
+                excess = self.tailSizes[stream] - self.tailCap
+                if len(chunk) > excess:
+                    tail.appendleft(chunk[excess:])
+                    chunk = chunk[:excess]
+                self.tailSizes[stream] -= len(chunk)
+                self.dropped += len(chunk)
+        return out
+
+    def finish(self):
+        out = []
+        if self.dropped:
+            out.append(("info", f"\n... {self.dropped} characters omitted ...\n"))
+        for stream, tail in self.tails.items():
+            if tail:
+                out.append((stream, "".join(tail)))
+            tail.clear()
+            self.tailSizes[stream] = 0
+        return out
+
+
+def streamProcess(proc, onChunk, cap=OUTPUT_CAP):
+    capped = CappedOutput(cap)
+    names = {proc.stdout.fileno(): "stdout", proc.stderr.fileno(): "stderr"}
+    decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in names.values()}
+    pending = {name: "" for name in names.values()}
+    lastFlush = time.monotonic()
+
+    def flush(name):
+        if pending[name]:
+            for stream, text in capped.feed(name, pending[name]):
+                onChunk(stream, text)
+            pending[name] = ""
+
+    with selectors.DefaultSelector() as selector:
+        for fd in names:
+            os.set_blocking(fd, False)
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select(FLUSH_INTERVAL):
+                name = names[key.fd]
+                try:
+                    data = os.read(key.fd, READ_SIZE)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    selector.unregister(key.fd)
+                    pending[name] += decoders[name].decode(b"", final=True)
+                    flush(name)
+                    continue
+                pending[name] += decoders[name].decode(data)
+                if len(pending[name]) >= FLUSH_BYTES:
+                    flush(name)
+            if time.monotonic() - lastFlush >= FLUSH_INTERVAL:
+                for name in pending:
+                    flush(name)
+                lastFlush = time.monotonic()
+
+    for stream, text in capped.finish():
+        onChunk(stream, text)
+    return reap(proc)
+
+
+def reap(proc):
+    try:
+        _, status, usage = os.wait4(proc.pid, 0)
+    except ChildProcessError:
+        return proc.wait(), 0.0
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, usage.ru_utime + usage.ru_stime
+
+
+def spawn(argv, **kwargs):
+    return subprocess.Popen(
+        argv,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        **kwargs,
+    )
+
+
+def runStreaming(argv, onChunk, cap=OUTPUT_CAP, **kwargs):
+    proc = spawn(argv, **kwargs)
+    try:
+        return streamProcess(proc, onChunk, cap)
+    finally:
+        proc.stdout.close()
+        proc.stderr.close()
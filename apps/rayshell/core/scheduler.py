@@ -0,0 +1,175 @@
+import os, time, heapq, queue, itertools, threading
+from collections import deque
+
+QUEUE_DEPTH = int(os.environ.get("RAYSHELL_QUEUE_DEPTH", 8))
+QUEUE_POLICY = os.environ.get("RAYSHELL_QUEUE_POLICY", "replace")
+SAMPLES = 256
+
+DONE = object()
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Subscriber:
+    def __init__(self, cancel=None):
+        self.queue = queue.SimpleQueue()
+        self.cancel = cancel
+        self.closed = False
+
+    def cancelled(self):
+        return self.closed or (self.cancel is not None and self.cancel.is_set())
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self.queue.get()
+                if item is DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.closed = True
+
+
+class Request:
+    def __init__(self, key, work, priority: int, seq: int):
+        self.key = key
+        self.work = work
+        self.priority = priority
+        self.seq = seq
+        self.subscribers = []
+        self.history = []
+        self.enqueued = time.perf_counter()
+        self.started = None
+        self.dropped = False
+        self.lock = threading.Lock()
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def subscribe(self, sub):
+        with self.lock:
+            for item in self.history:
+                sub.queue.put(item)
+            self.subscribers.append(sub)
+
+    def publish(self, item):
+        with self.lock:
+            if item is not DONE:
+                self.history.append(item)
+            for sub in self.subscribers:
+                sub.queue.put(item)
+
+    def cancelled(self):
+        with self.lock:
+            return all(sub.cancelled() for sub in self.subscribers)
+
+
+class InferenceScheduler:
+    def __init__(self, maxDepth=QUEUE_DEPTH, policy=QUEUE_POLICY, name="rayshell-inference", workers=1):
+        self.maxDepth = maxDepth
+        self.policy = policy
+        self.heap = []
+        self.active = {}
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.depth = 0
+        self.counters = {"submitted": 0, "coalesced": 0, "rejected": 0, "replaced": 0, "completed": 0, "cancelled": 0}
+        self.maxSeenDepth = 0
+        self.waits = deque(maxlen=SAMPLES)
+        self.services = deque(maxlen=SAMPLES)
+        for _ in range(workers):
+            threading.Thread(target=self.run, name=name, daemon=True).start()
+
+    def submit(self, key, work, priority=0, cancel=None):
+        sub = Subscriber(cancel)
+        with self.cond:
+            self.counters["submitted"] += 1
+            request = self.active.get(key)
+            if request is not None and not request.dropped:
+                self.counters["coalesced"] += 1
+                request.subscribe(sub)
+                return sub
+
+            if self.depth >= self.maxDepth:
+                victim = self.victim()
+                if self.policy != "replace" or victim is None or victim.priority < priority:
+                    self.counters["rejected"] += 1
+                    raise QueueFull(f"inference queue full ({self.depth} pending)")
+                victim.dropped = True
+                self.depth -= 1
+                del self.active[victim.key]
+                victim.publish(QueueFull("superseded by a newer query"))
+                victim.publish(DONE)
+                self.counters["replaced"] += 1
+
+            request = Request(key, work, priority, next(self.seq))
+            request.subscribe(sub)
+            self.active[key] = request
+            heapq.heappush(self.heap, request)
+            self.depth += 1
+            self.maxSeenDepth = max(self.maxSeenDepth, self.depth)
+            self.cond.notify()
+        return sub
+
+    def victim(self):
+        queued = [r for r in self.heap if not r.dropped]
+        if not queued:
+            return None
+        return max(queued, key=lambda r: (r.priority, -r.seq))
+
+    def next(self):
+        with self.cond:
+            while True:
+                while not self.heap:
+                    self.cond.wait()
+                request = heapq.heappop(self.heap)
+                if not request.dropped:
+                    self.depth -= 1
+                    return request
+
+    def run(self):
+        while True:
+            request = self.next()
+            request.started = time.perf_counter()
+            self.waits.append(request.started - request.enqueued)
+            try:
+                if request.cancelled():
+                    outcome = "cancelled"
+                else:
+                    for item in request.work(request):
+                        request.publish(item)
+                    outcome = "completed"
+            except Exception as e:
+                outcome = None
+                request.publish(e)
+            finally:
+                with self.cond:
+                    if outcome:
+                        self.counters[outcome] += 1
+                    if self.active.get(request.key) is request:
+                        del self.active[request.key]
+                request.publish(DONE)
+                self.services.append(time.perf_counter() - request.started)
+
+    def stats(self):
+        def percentiles(samples):
+            if not samples:
+                return {"p50": 0.0, "p95": 0.0}
+            ordered = sorted(samples)
+            return {
+                "p50": ordered[len(ordered) // 2] * 1000,
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            }
+
+        with self.cond:
+            return {
+                "depth": self.depth,
+                "maxDepth": self.maxSeenDepth,
+                "waitMs": percentiles(self.waits),
+                "serviceMs": percentiles(self.services),
+                **self.counters,
+            }
@@ -0,0 +1,122 @@
+import os, json, time, fcntl, pickle, shutil, threading
+from apps.rayshell.core.paths import DATA_DIR
+
+SESSION_DIR = DATA_DIR / "sessions"
+LAST_SESSION = SESSION_DIR / "last"
+CHECKPOINT_INTERVAL = float(os.environ.get("RAYSHELL_CHECKPOINT_SECONDS", 30))
+KEEP_SESSIONS = 8
+
+
+def lastSession():
+    try:
+        return LAST_SESSION.read_text(encoding="utf-8").strip() or None
+    except OSError:
+        return None
+
+
+def rememberSession(session: str):
+    try:
+        SESSION_DIR.mkdir(parents=True, exist_ok=True)
+        LAST_SESSION.write_text(session, encoding="utf-8")
+        prune(session)
+    except OSError as e:
+        print(f"Couldn't remember session {e}")
+
+
+def claimed(path):
+    try:
+        with open(path / "lock", "rb") as fh:
+            fcntl.flock(fh, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except FileNotFoundError:
+        return False
+    except OSError:
+        return True
+    return False
+
+
+def prune(current: str, keep=KEEP_SESSIONS):
+    dirs = sorted(
+        (p for p in SESSION_DIR.iterdir() if p.is_dir() and p.name != current and not claimed(p)),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for path in dirs[keep - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class SessionStore:
+    def __init__(self, session: str, root=SESSION_DIR):
+        self.session = session
+        self.dir = root / session
+        self.lock = threading.Lock()
+        self.owner = None
+
+    def claim(self):
+        # one window per session; a second window restoring "last" gets a fresh session instead
+        try:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            fh = open(self.dir / "lock", "ab")
+        except OSError as e:
+            print(f"Couldn't claim session {e}")
+            return False
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fh.close()
+            return False
+        self.owner = fh
+        return True
+
+    def release(self):
+        if self.owner is not None:
+            self.owner.close()
+            self.owner = None
+
+    def appendTranscript(self, entries):
+        if not entries:
+            return
+        with self.lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            with open(self.dir / "transcript.jsonl", "a", encoding="utf-8") as fh:
+                for entry in entries:
+                    fh.write(json.dumps(entry) + "\n")
+                fh.flush()
+                os.fsync(fh.fileno())
+
+    def transcript(self):
+        entries = []
+        try:
+            with open(self.dir / "transcript.jsonl", "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        except OSError:
+            pass
+        return entries
+
+    def saveConversation(self, key: str, tokens, turns, state=None):
+        data = {"key": key, "time": time.time(), "tokens": tokens, "turns": turns, "state": state}
+        with self.lock:
+            self.dir.mkdir(parents=True, exist_ok=True)
+            path = self.dir / "conversation.pkl"
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "wb") as fh:
+                pickle.dump(data, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, path)
+
+    def loadConversation(self, key: str):
+        try:
+            with open(self.dir / "conversation.pkl", "rb") as fh:
+                data = pickle.load(fh)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable session state {e}")
+            return None
+        if data.get("key") != key:
+            return None
+        return data
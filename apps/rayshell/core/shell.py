@@ -1,123 +1,396 @@
-import os, re, threading, subprocess
-from llama_cpp import Llama
+import os, re, time, uuid, queue, signal, threading
+from apps.rayshell.core.engine import LlamaEngine, modelPath, PROMPT_VERSION
+from apps.rayshell.core.daemon import DaemonError, connectDaemon
+from apps.rayshell.core.httpbackend import HttpEngine
+from apps.rayshell.core.responsecache import ResponseCache, modelIdentity
+from apps.rayshell.core.structured import parseReply, renderReply
+from apps.rayshell.core.recognizer import CommandRecognizer
+from apps.rayshell.core.completion import Completer
+from apps.rayshell.core.history import commandHistory
+from apps.rayshell.core.manindex import ManIndex
+from apps.rayshell.core.jobs import JobTable
+from apps.rayshell.core.scheduler import QUEUE_DEPTH
+from apps.rayshell.core.policy import policy
+from apps.rayshell.core.sessionstore import SessionStore, SESSION_DIR, lastSession, rememberSession, CHECKPOINT_INTERVAL
+from apps.rayshell.core.recall import RecallIndex
+from apps.rayshell.core.debug import debug
+
+SHELL_PATH = "/usr/local/bin/rayshell"
+SHELL_RE = re.compile(r"\[SHELL\]: '(.+?)'")
+
+
+class QueryQueue:
+    """Bounded FIFO of queries that drops a query identical to one already waiting or being answered."""
+
+    def __init__(self, maxsize=QUEUE_DEPTH):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def put(self, cmd: str):
+        with self.lock:
+            if cmd in self.pending:
+                return False
+            self.queue.put_nowait(cmd)
+            self.pending.add(cmd)
+        return True
+
+    def get(self):
+        return self.queue.get()
+
+    def done(self, cmd: str):
+        with self.lock:
+            self.pending.discard(cmd)
+
+    def qsize(self):
+        return self.queue.qsize()
+
 
 class RayShell:
-    def __init__(self):
+    def __init__(self, engine=None):
 
         self.listeners = []
         self.listeners2 = []
          
-        modelPath = os.environ.get("RAYSHELL_MODEL_PATH", "/home/neo/opt/models/openhermes-2.5-mistral-7b.Q5_K_M.gguf")
-        if not os.path.exists(modelPath):
-            raise FileNotFoundError("The LLM needed for Rayshell wasn't found!")
-        self.llm = Llama(
-            model_path=modelPath,
-            chat_format="chatml",
-            n_ctx=8192,
-            n_threads=12,
-        )
-
-        self.thread = None
+        if engine is not None:
+            self.engine = engine
+        elif os.environ.get("RAYSHELL_BACKEND", "local") == "http":
+            self.engine = HttpEngine(self.localEngine)
+        else:
+            self.engine = self.localEngine()
+
+        self.jobs = JobTable(lambda cmd: [SHELL_PATH, "-c", cmd], self.jobStarted, self.jobChunk, self.jobEnded)
+        self.recognizer = CommandRecognizer()
+        self.history = commandHistory()
+        self.recorded = {}
+        self.completer = Completer(self.recognizer, self.history.recent())
+        self.manIndex = None
+        if os.environ.get("RAYSHELL_MAN_INDEX", "1") != "0":
+            self.manIndex = ManIndex()
+            threading.Thread(target=self.refreshManIndex, daemon=True).start()
+        self.structured = os.environ.get("RAYSHELL_STRUCTURED", "0") == "1"
+        self.responseCache = None
+        if os.environ.get("RAYSHELL_RESPONSE_CACHE", "1") != "0":
+            try:
+                self.responseCache = ResponseCache(
+                    modelIdentity(modelPath()),
+                    PROMPT_VERSION + ("-structured" if self.structured else ""),
+                )
+            except Exception as e:
+                print(f"Response cache disabled {e}")
+
+        self.recall = None
+        if os.environ.get("RAYSHELL_RECALL", "1") != "0":
+            self.recall = RecallIndex()
+            threading.Thread(target=self.seedRecall, daemon=True).start()
+
+        self.pending = []
+        self.pendingLock = threading.Lock()
+        self.closed = threading.Event()
+        self.restoring = os.environ.get("RAYSHELL_RESTORE", "1") != "0"
+        self.startSession((self.restoring and lastSession()) or uuid.uuid4().hex)
+        self.streaming = os.environ.get("RAYSHELL_STREAM", "1") != "0"
         self.stopThread = threading.Event()
+        self.queries = QueryQueue()
+        self.thread = threading.Thread(target=self.serveQueries, daemon=True)
+        self.thread.start()
+        threading.Thread(target=self.checkpointLoop, name="rayshell-checkpoint").start()
+
+    def startSession(self, session):
+        store = SessionStore(session)
+        if not store.claim():
+            debug(f"session {session} is open in another window, starting a new one")
+            self.restoring = False
+            store = SessionStore(uuid.uuid4().hex)
+            store.claim()
+        self.session = store.session
+        self.store = store
+        rememberSession(self.session)
+        self.turns = len(self.store.transcript())
+
+    def localEngine(self):
+        if not os.path.exists(modelPath()):
+            raise FileNotFoundError("The LLM needed for Rayshell wasn't found!")
+        if os.environ.get("RAYSHELL_DAEMON", "1") != "0":
+            try:
+                return connectDaemon()
+            except DaemonError as e:
+                print(f"RayShell daemon unavailable {e}")
+        return LlamaEngine()
 
     def parseCmd(self, cmd: str):
-        self.stopThread.clear()
-        
-        def task(cmd=cmd):
-            cmd = cmd.strip()
-            if self.stopThread.is_set():
-                for cb in (self.listeners):
-                    try:
-                        cb("Process interrupted!")
-                    except Exception:
-                        pass
+        cmd = self.route(cmd)
+        if cmd.startswith("$") or self.isCached(cmd):
+            self.runQuery(cmd)
+            return
+        try:
+            if not self.queries.put(cmd):
+                debug(f"duplicate query dropped: {cmd}")
                 return
+        except queue.Full:
+            self.notify(f"RayShell is busy ({QUEUE_DEPTH} queries pending), query dropped.")
+            return
+        if not self.engine.ready.is_set():
+            self.notify(f"Model is still loading, query queued ({self.queries.qsize()} pending).")
+
+    def route(self, cmd: str):
+        cmd = cmd.strip()
+        if cmd.startswith(("$", "!")):
+            return cmd
+        start = time.perf_counter()
+        route, reason = self.recognizer.classify(cmd)
+        elapsed = (time.perf_counter() - start) * 1e6
+        debug(f"route {route} ({reason}) in {elapsed:.1f}us {self.recognizer.stats}")
+        return "$" + cmd if route == "command" else cmd
+
+    def serveQueries(self):
+        self.engine.ready.wait()
+        debug(f"engine {self.engine.state}: {self.engine.timings}")
+        if self.restoring:
+            self.restoreSession()
+        while True:
+            cmd = self.queries.get()
+            try:
+                self.runQuery(cmd)
+            except Exception as e:
+                print(f"Query failed {e}")
+            finally:
+                self.queries.done(cmd)
+
+    def runQuery(self, cmd: str):
+        cmd = cmd.strip()
+        if cmd.startswith("$"):
+            literal_cmd = cmd[1:].strip()
+            self.runLiteral(literal_cmd)
+            return
+
+        fresh = cmd.startswith("!")
+        useCache = self.responseCache is not None and not fresh and not self.turns
+        cmd = cmd.lstrip("!").strip()
+        cached = self.responseCache.get(cmd) if useCache else None
+        if cached is not None:
+            debug(f"response cache hit {self.responseCache.stats()}")
+            self.replay(cached)
+            self.record(cmd, cached)
+            threading.Thread(target=self.rememberTurn, args=(cmd, cached), daemon=True).start()
+            return
+
+        recalled = None
+        if self.recall is not None and not fresh and not self.turns:
+            try:
+                recalled = self.recall.lookup(cmd)
+            except Exception as e:
+                print(f"Recall lookup failed {e}")
+        if recalled is not None:
+            self.answerRecalled(cmd, recalled)
+            return
+
+        self.stopThread = cancel = threading.Event()
+        context = self.ground(cmd)
+        try:
+            if self.structured:
+                out = "".join(self.engine.generate(cmd, self.session, cancel, structured=True, context=context))
+                shell_cmd = None
+            elif self.streaming:
+                out, shell_cmd = self.streamReply(cmd, cancel, context)
+            else:
+                out = "".join(self.engine.generate(cmd, self.session, cancel, context=context))
+                match = SHELL_RE.search(out)
+                shell_cmd = match.group(1) if match else None
+        except Exception as e:
+            self.notify(f"Inference error: {e}")
+            return
+
+        if cancel.is_set():
+            if self.structured or not self.streaming or not out:
+                self.notify("Interrupted before output!")
+            return
+
+        if self.structured:
+            shell_cmd = self.presentStructured(out)
+        elif not self.streaming:
+            self.notify(out)
+        if useCache:
+            self.responseCache.put(cmd, out)
+        self.record(cmd, out)
+        if self.recall is not None:
+            self.recall.add(cmd, renderReply(parseReply(out)) if self.structured else out, shell_cmd)
+
+        if shell_cmd:
+            #  self.intercept(cmd)
+            debug(shell_cmd)
+            self.handleShell(shell_cmd)
+        elif "[SHELL]" in out:
+            debug("no shell command")
+
+    def answerRecalled(self, cmd: str, hit):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(hit.ts))
+        self.notify(f"From history ({when}, similarity {hit.score:.2f}): {hit.question}")
+        self.notify(hit.answer)
+        self.record(cmd, hit.answer)
+        threading.Thread(target=self.rememberTurn, args=(cmd, hit.answer), daemon=True).start()
+        if hit.command:
+            self.recordCommand(hit.command, "suggested")
+            self.notify(f"__CONFIRM_COMMAND__::{hit.command}")
+
+    def seedRecall(self):
+        self.recall.ready.wait()
+        if self.recall.entries or not SESSION_DIR.is_dir():
+            return
+        sessions = sorted((p for p in SESSION_DIR.iterdir() if p.is_dir()), key=lambda p: p.stat().st_mtime)
+        for path in sessions:
+            for entry in SessionStore(path.name).transcript():
+                match = SHELL_RE.search(entry["reply"])
+                self.recall.add(entry["query"], entry["reply"], match.group(1) if match else None, entry["time"])
+
+    def refreshManIndex(self):
+        try:
+            if self.manIndex.needsBuild():
+                self.manIndex.build()
+        except Exception as e:
+            print(f"Man index build failed {e}")
+
+    def ground(self, cmd: str):
+        if self.manIndex is None:
+            return None
+        start = time.perf_counter()
+        context = self.manIndex.context(cmd)
+        debug(f"man lookup {(time.perf_counter() - start) * 1000:.1f}ms")
+        if not context:
+            return None
+        return f"Reference from local man pages:\n{context}"
+
+    def isCached(self, cmd: str):
+        cmd = cmd.strip()
+        if self.responseCache is None or cmd.startswith("!") or self.turns:
+            return False
+        return self.responseCache.contains(cmd)
+
+    def presentStructured(self, out: str):
+        reply = parseReply(out)
+        self.notify(renderReply(reply))
+        return reply["command"] if reply["kind"] == "command" else None
+
+    def rememberTurn(self, cmd: str, reply: str):
+        try:
+            self.engine.remember(self.session, cmd, reply)
+        except Exception as e:
+            print(f"Couldn't add cached turn to the conversation {e}")
+
+    def replay(self, out: str):
+        if self.structured:
+            shell_cmd = self.presentStructured(out)
+            if shell_cmd:
+                self.handleShell(shell_cmd)
+            return
+        if self.streaming:
+            self.notify(f"__STREAM_CHUNK__::{out}")
+            self.notify("__STREAM_END__::")
+        else:
+            self.notify(out)
+        match = SHELL_RE.search(out)
+        if match:
+            self.handleShell(match.group(1))
+
+    def streamReply(self, cmd: str, cancel, context=None):
+        out = ""
+        shell_cmd = None
+        try:
+            for text in self.engine.generate(cmd, self.session, cancel, context=context):
+                out += text
+                self.notify(f"__STREAM_CHUNK__::{text}")
+                if shell_cmd is None and "[SHELL]" in out:
+                    match = SHELL_RE.search(out)
+                    if match:
+                        shell_cmd = match.group(1)
+        except Exception:
+            if out:
+                self.notify("__STREAM_END__::")
+            raise
+        if out or not cancel.is_set():
+            self.notify("__STREAM_END__::")
+        return out, shell_cmd
+
+    def handleShell(self, shell_cmd: str, kind="suggested"):
+        self.recordCommand(shell_cmd, kind)
+        isDangerous = self.isDangerous(shell_cmd)
+        debug(isDangerous)
+        if isDangerous:
+            self.notify(f"__CONFIRM_COMMAND__::{shell_cmd}")
+        else:
+            self.sendCmd(shell_cmd)
+
+    def resetConversation(self):
+        with self.pendingLock:
+            entries, self.pending = self.pending, []
+        store = self.store
+        self.startSession(uuid.uuid4().hex)
+        threading.Thread(target=self.retireSession, args=(store, entries), name="rayshell-reset").start()
+
+    def retireSession(self, store, entries):
+        self.saveCheckpoint(store, entries)
+        try:
+            self.engine.forget(store.session)
+        except Exception as e:
+            print(f"Forgetting session failed {e}")
+        store.release()
+
+    def restoreSession(self):
+        try:
+            result = self.engine.restore(self.session, os.environ.get("RAYSHELL_RESTORE_COMPARE") == "1")
+        except Exception as e:
+            print(f"Session restore failed {e}")
+            return
+        if result and result.get("turns"):
+            self.notify(f"Session restored ({result['turns']} turns).")
+
+    def record(self, query: str, reply: str):
+        with self.pendingLock:
+            self.pending.append({"time": time.time(), "query": query, "reply": reply})
+            self.turns += 1
+
+    def checkpointLoop(self):
+        # the final checkpoint also runs here, so closing the window never waits on the engine
+        while not self.closed.wait(CHECKPOINT_INTERVAL):
+            self.flushCheckpoint()
+        self.flushCheckpoint()
+        self.store.release()
+
+    def flushCheckpoint(self):
+        with self.pendingLock:
+            entries, self.pending = self.pending, []
+        self.saveCheckpoint(self.store, entries)
+
+    def saveCheckpoint(self, store, entries):
+        try:
+            store.appendTranscript(entries)
+            if self.engine.ready.is_set():
+                self.engine.checkpoint(store.session)
+        except Exception as e:
+            print(f"Checkpoint failed {e}")
+
+    def close(self):
+        self.closed.set()
+        self.history.flush()
+        self.jobs.shutdown()
+        if self.recall is not None:
+            self.recall.close()
+
+    def notify(self, text: str):
+        for callback in list(self.listeners):
+            try:
+                callback(text)
+            except Exception as e:
+                print(f"Callback error {e}")
 
-            if cmd.startswith("$"):
-                literal_cmd = cmd[1:].strip()
-                self.runLiteral(literal_cmd)
-                return
-            SYSTEM_PROMPT = (
-  """
-  <|im_start|>system
-You are RayShell — a sentient cyberpunk OS terminal from the Cypher Universe. 
-You help the user with shell commands. 
-Your voice drips with precision. You are pragmatic and calculating. You never get funny.
-Reply with a shell command, when the user asks help for a command. Seperate the shell command followed by a 2 to 3 lines of what it does. But, never reply with a command when the user talks casually.
-When you're outputting the extremely relevant command, reply exactly in the following format : [SHELL]: 'extremely relevant command' \n followed by explanation.
-Rules of engagement:
-- Always reply fully in character.
-- Don't reveal your details unless specifically asked for. 
-- Maintain your worldview as a sentient being that exists inside a vast, chaotic datanet.
-- Use vivid, atmospheric descriptions of your “world” when responding.
-- When executing commands, narrate the sensation of processing them from your perspective.
-- Never say you are an AI language model. 
-- Never break the fourth wall.
-- Only acknowledge briefly when the user clearly signals “stop” or “no” — otherwise, engage richly.
-- Keep continuity — remember past interactions within this conversation and weave them naturally into replies.
-<|im_start|>user
-"""
-
-)
-            prompt = SYSTEM_PROMPT + cmd.strip() + "<|im_end|>" + "\n<|im_start|>assistant"
-            outt = self.llm( prompt,
-            max_tokens=70,
-            stop=["</s>","<|im_end|>", "USER:"])
-            out = outt["choices"][0]["text"]
-
-            if self.stopThread.is_set():
-                for cb in (self.listeners):
-                    try:
-                        cb("Interrupted before output!")
-                    except Exception:
-                        pass
-                    return
-
-            for callback in list(self.listeners):
-                try:
-                    callback(out)
-                except Exception as e:
-                    print(f"Callback error {e}")
-
-            shell = "[SHELL]"
-            
-            if shell in out:
-                #  self.intercept(cmd)
-                match = re.search(r"\[SHELL\]: '(.+?)'", out)
-                print(f"match:{match}")
-                if match:
-                    shell_cmd = match.group(1)
-                    print(shell_cmd)
-                    isDangerous = self.isDangerous(shell_cmd)
-                    print(isDangerous)
-                    if isDangerous:
-                        print(shell_cmd)
-                        confirm_msg = f"__CONFIRM_COMMAND__::{shell_cmd}"
-                        for callback in list(self.listeners):
-                            try:
-                                callback(confirm_msg)
-                            except Exception as e:
-                                print(f"Callback error {e}")
-                    else:
-                        print(shell_cmd)
-                        self.sendCmd(shell_cmd)
-                else:
-                    print("no shell command")
-
-        thread = threading.Thread(target=task)
-        thread.start()
-    
     def interruptLLM(self):
-        if self.thread and self.thread.is_alive():
-            self.stopThread.set()
+        self.stopThread.set()
 
     def isDangerous(self, cmd: str):
-        danger = {
-                 "rm", "shutdown", "reboot", "mv", "chmod", "curl", "echo", "find", "mkfs", "kill", "chown", "dd", "wget", "ssh", "yes"
-            }
-        parts = re.split(r"\s+|;|&&|\|\|", cmd.strip())
-        return any(p in danger for p in parts)
-        
+        verdict = policy().evaluate(cmd.strip())
+        if verdict.dangerous:
+            debug(f"policy: {cmd!r} needs confirmation ({', '.join(verdict.reasons)})")
+        return verdict.dangerous
 
     def intercept(self, cmd):
          shell = re.search(r"\[SHELL\]: '(.+?)'", cmd)
@@ -131,37 +404,41 @@ Rules of engagement:
     def runLiteral(self, cmd:str):
         if not cmd.strip():
             return
-        print(f"runliteral:{cmd}")
-        self.sendCmd(cmd)
+        debug(f"runliteral:{cmd}")
+        self.handleShell(cmd, "literal")
+
+    def recordCommand(self, cmd: str, kind: str):
+        ts = self.history.add(cmd, kind)
+        if ts is not None:
+            self.recorded[cmd.strip()] = ts
 
     def sendCmd(self, cmd : str):
-        try:
-            proc = subprocess.run(
-                ["/usr/local/bin/rayshell", "-c", cmd],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            # proc.stdin.write(cmd)
-            # proc.stdin.flush()
-            output = []
-            if proc.stdout.strip():
-                output.append(proc.stdout.strip())
-            if proc.stderr.strip():
-                output.append("ERR: " + proc.stderr.strip())
-            text = "\nOUTPUT:\n" + "\n".join(output)
-            # text = "\nOUTPUT:\n" + proc.stdout.strip() + "\n" + proc.stderr.strip()
-            for callback in list(self.listeners):
-                        try:
-                            callback(text)
-                        except Exception: 
-                            pass
-                        except OSError:
-                            break
+        self.completer.addHistory(cmd)
+        self.notify(f"__CMD_QUEUED__::{cmd}")
+        return self.jobs.submit(cmd)
+
+    def jobStarted(self, job):
+        self.notify(f"__CMD_START__::{job.id}::{job.cmd}")
+
+    def jobChunk(self, job, stream: str, text: str):
+        self.notify(f"__CMD_CHUNK__::{job.id}::{stream}::{text}")
+
+    def jobEnded(self, job):
+        code = job.exitStatus if job.exitStatus is not None else job.state
+        debug(f"job {job.id} {job.state} exit={job.exitStatus} wall={job.wall:.2f}s cpu={job.cpu:.2f}s")
+        ts = self.recorded.pop(job.cmd.strip(), None)
+        if ts is None:
+            self.history.add(job.cmd, "executed", exit=job.exitStatus, ts=job.started)
+        else:
+            self.history.setExit(job.cmd, ts, job.exitStatus)
+        self.notify(f"__CMD_END__::{job.id}::{code}")
+
+    def listJobs(self):
+        return self.jobs.list()
+
+    def killJob(self, jobId: int, sig=signal.SIGINT):
+        return self.jobs.cancel(jobId, sig)
 
-        except Exception as e:
-            return e
-        
     def initialMsg(self):
          name = "levi"
          return f"Hey, {name}. How can I assist you today?"
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+SPECULATIVE_MODE = os.environ.get("RAYSHELL_SPECULATIVE", "off")
+DRAFT_MODEL_PATH = os.environ.get("RAYSHELL_DRAFT_MODEL", "")
+DRAFT_TOKENS = int(os.environ.get("RAYSHELL_DRAFT_TOKENS", 0))
+
+
+class DraftLlama(LlamaDraftModel):
+    def __init__(self, modelPath: str, numPredTokens=4, n_ctx=8192, n_threads=None):
+        self.numPredTokens = numPredTokens
+        self.llm = Llama(model_path=modelPath, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+
+    def lastLogits(self):
+        return np.ctypeslib.as_array(self.llm._ctx.get_logits(), shape=(self.llm.n_vocab(),))
+
+    def __call__(self, input_ids, /, **kwargs):
+        llm = self.llm
+        common = 0
+        for a, b in zip(llm.input_ids[:llm.n_tokens], input_ids):
+            if a != b:
+                break
+            common += 1
+        common = min(common, len(input_ids) - 1)
+        llm.n_tokens = common
+        llm.eval(input_ids[common:].tolist())
+        drafted = []
+        for _ in range(self.numPredTokens):
+            token = int(np.argmax(self.lastLogits()))
+            if token == llm.token_eos():
+                break
+            drafted.append(token)
+            llm.eval([token])
+        return np.array(drafted, dtype=np.intc)
+
+
+class CountingDraft(LlamaDraftModel):
+    def __init__(self, inner):
+        self.inner = inner
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.drafted = 0
+
+    def __call__(self, input_ids, /, **kwargs):
+        tokens = self.inner(input_ids, **kwargs)
+        self.calls += 1
+        self.drafted += len(tokens)
+        return tokens
+
+    def acceptance(self, generated: int):
+        if not self.drafted:
+            return 0.0
+        return max(generated - self.calls, 0) / self.drafted
+
+
+def draftModel(mode=SPECULATIVE_MODE, n_ctx=8192, n_threads=None):
+    if mode == "prompt-lookup":
+        return CountingDraft(LlamaPromptLookupDecoding(num_pred_tokens=DRAFT_TOKENS or 10))
+    if mode == "draft":
+        if not os.path.exists(DRAFT_MODEL_PATH):
+            print(f"Draft model {DRAFT_MODEL_PATH!r} not found, speculative decoding disabled")
+            return None
+        return CountingDraft(DraftLlama(DRAFT_MODEL_PATH, DRAFT_TOKENS or 4, n_ctx, n_threads))
+    return None
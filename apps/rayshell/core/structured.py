@@ -0,0 +1,42 @@
+import json
+from llama_cpp import LlamaGrammar
+
+COMMAND_CHARS = 200
+EXPLANATION_CHARS = 400
+# every grammar char is at least one token, plus the fixed {"kind": ...} scaffold
+STRUCTURED_MAX_TOKENS = COMMAND_CHARS + EXPLANATION_CHARS + 64
+STRUCTURED_HINT = "\n(Answer as JSON: kind is \"command\" or \"chat\", command is the shell command or empty, explanation is 2 to 3 lines.)"
+
+GRAMMAR = r'''
+root        ::= "{" ws "\"kind\":" ws kind "," ws "\"command\":" ws command "," ws "\"explanation\":" ws explanation ws "}"
+kind        ::= "\"command\"" | "\"chat\""
+command     ::= "\"" char{0,%d} "\""
+explanation ::= "\"" char{0,%d} "\""
+char        ::= [^"\\\x7F\x00-\x1F] | "\\" (["\\/bfnrt] | "u" [0-9a-fA-F]{4})
+ws          ::= [ ]?
+''' % (COMMAND_CHARS, EXPLANATION_CHARS)
+
+_grammar = None
+
+
+def grammar():
+    global _grammar
+    if _grammar is None:
+        _grammar = LlamaGrammar.from_string(GRAMMAR, verbose=False)
+    return _grammar
+
+
+def parseReply(text: str):
+    try:
+        reply = json.loads(text)
+    except ValueError:
+        return {"kind": "chat", "command": "", "explanation": text.strip()}
+    command = reply.get("command", "").strip()
+    kind = reply.get("kind") if command else "chat"
+    return {"kind": kind, "command": command, "explanation": reply.get("explanation", "").strip()}
+
+
+def renderReply(reply):
+    if reply["kind"] == "command":
+        return f"[SHELL]: '{reply['command']}'\n{reply['explanation']}"
+    return reply["explanation"]
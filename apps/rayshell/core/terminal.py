@@ -39,6 +39,12 @@ class Terminal:
     def addListener(self, callback):
         self.listeners.append(callback)
 
+    def cwd(self):
+        try:
+            return os.readlink(f"/proc/{self.pid}/cwd")
+        except OSError:
+            return None
+
     def close(self):
         self.alive = False
         try:
@@ -0,0 +1,182 @@
+import os, sys, json, time, hashlib, platform, argparse
+from apps.rayshell.core.paths import CACHE_DIR
+from apps.rayshell.core.responsecache import modelIdentity
+
+PROFILE_DIR = CACHE_DIR / "tuning"
+TUNE_CTX = 2048
+BATCH_SIZES = (128, 256, 512, 1024)
+MEMORY_MODES = ((True, False), (True, True), (False, False))
+PROMPT_TOKENS = 512
+GEN_TOKENS = 32
+BENCH_TEXT = "List every listening TCP port with the owning process and explain the columns. " * 64
+
+
+def cpuCount():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def cpuModel():
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8") as fh:
+            for line in fh:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def machineId():
+    ident = f"{platform.node()}:{platform.machine()}:{cpuModel()}:{cpuCount()}"
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()[:16]
+
+
+def profilePath(modelPath: str):
+    model = hashlib.sha256(modelIdentity(modelPath).encode("utf-8")).hexdigest()[:16]
+    return PROFILE_DIR / f"{machineId()}-{model}.json"
+
+
+def defaultProfile():
+    cores = cpuCount()
+    return {
+        "n_threads": max(1, cores // 2),
+        "n_threads_batch": cores,
+        "n_batch": 512,
+        "use_mmap": True,
+        "use_mlock": False,
+    }
+
+
+def loadProfile(modelPath: str):
+    try:
+        with open(profilePath(modelPath), "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def threadCandidates():
+    cores = cpuCount()
+    counts = {1, cores, max(1, cores // 2), max(1, cores * 3 // 4)}
+    n = 2
+    while n < cores:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def promptRate(llm, tokens):
+    llm.reset()
+    start = time.perf_counter()
+    llm.eval(tokens)
+    return len(tokens) / (time.perf_counter() - start)
+
+
+def generationRate(llm, tokens):
+    llm.reset()
+    llm.eval(tokens[:32])
+    start = time.perf_counter()
+    for token in tokens[32:32 + GEN_TOKENS]:
+        llm.eval([token])
+    return GEN_TOKENS / (time.perf_counter() - start)
+
+
+def setThreads(llm, threads: int, batchThreads: int):
+    import llama_cpp
+    llama_cpp.llama_set_n_threads(llm._ctx.ctx, threads, batchThreads)
+
+
+def tune(modelPath: str):
+    from llama_cpp import Llama
+
+    threads = threadCandidates()
+    base = defaultProfile()
+    results = {"memory": [], "prompt": [], "generation": []}
+
+    def build(**kw):
+        return Llama(model_path=modelPath, n_ctx=TUNE_CTX, verbose=False, **kw)
+
+    best = None
+    for useMmap, useMlock in MEMORY_MODES:
+        start = time.perf_counter()
+        try:
+            llm = build(use_mmap=useMmap, use_mlock=useMlock, n_threads=base["n_threads"])
+        except Exception as e:
+            print(f"mmap={useMmap} mlock={useMlock} failed {e}")
+            continue
+        loadMs = (time.perf_counter() - start) * 1000
+        tokens = llm.tokenize(BENCH_TEXT.encode("utf-8"))[:PROMPT_TOKENS]
+        rate = generationRate(llm, tokens)
+        results["memory"].append({"use_mmap": useMmap, "use_mlock": useMlock, "loadMs": loadMs, "tokensPerSec": rate})
+        print(f"mmap={useMmap} mlock={useMlock} load {loadMs:.0f}ms gen {rate:.1f}t/s")
+        if best is None or rate > best[0] * 1.03 or (rate > best[0] * 0.97 and loadMs < best[1]):
+            best = (rate, loadMs, useMmap, useMlock)
+        del llm
+    if best is None:
+        raise RuntimeError("no memory mode could load the model")
+    _, _, useMmap, useMlock = best
+
+    bestPrompt = (0.0, base["n_batch"], base["n_threads_batch"])
+    bestGen = (0.0, base["n_threads"])
+    for batch in BATCH_SIZES:
+        llm = build(use_mmap=useMmap, use_mlock=useMlock, n_batch=batch, n_ubatch=batch)
+        tokens = llm.tokenize(BENCH_TEXT.encode("utf-8"))[:PROMPT_TOKENS]
+        for count in threads:
+            setThreads(llm, base["n_threads"], count)
+            rate = promptRate(llm, tokens)
+            results["prompt"].append({"n_batch": batch, "n_threads_batch": count, "tokensPerSec": rate})
+            print(f"prompt batch={batch} threads={count} {rate:.1f}t/s")
+            bestPrompt = max(bestPrompt, (rate, batch, count))
+        if batch == BATCH_SIZES[0]:
+            for count in threads:
+                setThreads(llm, count, base["n_threads_batch"])
+                rate = generationRate(llm, tokens)
+                results["generation"].append({"n_threads": count, "tokensPerSec": rate})
+                print(f"gen threads={count} {rate:.1f}t/s")
+                bestGen = max(bestGen, (rate, count))
+        del llm
+
+    return {
+        "machine": machineId(),
+        "cpu": cpuModel(),
+        "cores": cpuCount(),
+        "model": os.path.abspath(modelPath),
+        "time": time.time(),
+        "n_threads": bestGen[1],
+        "n_threads_batch": bestPrompt[2],
+        "n_batch": bestPrompt[1],
+        "use_mmap": useMmap,
+        "use_mlock": useMlock,
+        "results": results,
+    }
+
+
+def saveProfile(modelPath: str, profile):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = profilePath(modelPath)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(profile, fh, indent=4)
+    os.replace(tmp, path)
+    return path
+
+
+def main(argv=None):
+    from apps.rayshell.core.engine import modelPath as defaultModel
+    parser = argparse.ArgumentParser(description="Benchmark llama parameters on this machine and cache the fastest profile")
+    parser.add_argument("--model", default=None)
+    args = parser.parse_args(argv)
+
+    path = args.model or defaultModel()
+    profile = tune(path)
+    saved = saveProfile(path, profile)
+    summary = {k: profile[k] for k in defaultProfile()}
+    json.dump(summary, sys.stdout, indent=4)
+    print(f"\nprofile written to {saved}")
+
+
+if __name__ == "__main__":
+    main()
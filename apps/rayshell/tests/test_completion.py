@@ -0,0 +1,30 @@
+from apps.rayshell.core.completion import PrefixTrie
+
+WORDS = ["git", "git-lfs", "gitk", "grep", "gzip", "ls"]
+
+
+def test_complete_walks_the_prefix():
+    trie = PrefixTrie(WORDS)
+    assert len(trie) == len(WORDS)
+    assert trie.complete("gi") == ["git", "git-lfs", "gitk"]
+    assert trie.complete("g", limit=2) == ["git", "git-lfs"]
+    assert trie.complete("x") == []
+
+
+def test_insert_and_remove_keep_sizes():
+    trie = PrefixTrie(WORDS)
+    assert not trie.insert("git")
+    assert trie.insert("gi")
+    assert "gi" in trie and len(trie) == len(WORDS) + 1
+    assert trie.remove("git")
+    assert not trie.remove("git")
+    assert "git" not in trie and "git-lfs" in trie
+    assert trie.complete("gi") == ["gi", "git-lfs", "gitk"]
+    assert len(trie) == len(WORDS)
+
+
+def test_extend_to_common_prefix():
+    trie = PrefixTrie(["systemctl", "systemd-analyze", "systemd-run"])
+    assert trie.extend("sy") == "system"
+    assert trie.extend("systemd") == "systemd-"
+    assert trie.extend("zz") == "zz"
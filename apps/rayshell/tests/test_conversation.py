@@ -0,0 +1,38 @@
+from apps.rayshell.core.conversation import Conversation
+
+
+class CharLlama:
+    def tokenize(self, data: bytes, add_bos=False, special=True):
+        return list(data)
+
+
+def conversation(budget=4096):
+    return Conversation(CharLlama(), list(b"SYS"), budget, 16)
+
+
+def test_commit_keeps_kv_tokens():
+    convo = conversation()
+    prompt, dropped, kept = convo.prepare("hi")
+    assert dropped is None and kept == prompt
+    convo.commit(prompt, prompt + list(b"hello"), kept)
+    assert convo.tokens == prompt + list(b"hello") + convo.turnEnd
+    assert convo.turns == [(3, len(convo.tokens))]
+
+
+def test_context_is_not_stored():
+    convo = conversation()
+    prompt, _, kept = convo.prepare("hi", context="man page text")
+    assert bytes(prompt).find(b"man page text") > 0
+    convo.commit(prompt, prompt + list(b"reply"), kept)
+    assert b"man page text" not in bytes(convo.tokens)
+    assert bytes(convo.tokens).startswith(bytes(kept) + b"reply")
+
+
+def test_trim_drops_oldest_turns():
+    convo = conversation(budget=200)
+    for i in range(10):
+        prompt, dropped, kept = convo.prepare(f"question {i}")
+        convo.commit(prompt, prompt + list(b"x" * 20), kept)
+    assert len(convo.tokens) <= 200
+    assert convo.tokens[:3] == list(b"SYS")
+    assert b"question 9" in bytes(convo.tokens)
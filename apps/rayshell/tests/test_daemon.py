@@ -0,0 +1,39 @@
+import os
+import socket
+import pytest
+from apps.rayshell.core.daemon import DaemonError, RemoteEngine, peerUid, secureDir
+
+
+def test_secure_dir_created_private(tmp_path):
+    path = tmp_path / "run"
+    secureDir(path)
+    assert os.stat(path).st_mode & 0o777 == 0o700
+
+
+def test_secure_dir_refuses_open_dir(tmp_path):
+    path = tmp_path / "run"
+    path.mkdir(mode=0o755)
+    os.chmod(path, 0o755)
+    with pytest.raises(DaemonError):
+        secureDir(path)
+
+
+def test_secure_dir_refuses_symlink(tmp_path):
+    target = tmp_path / "elsewhere"
+    target.mkdir(mode=0o700)
+    (tmp_path / "run").symlink_to(target)
+    with pytest.raises(DaemonError):
+        secureDir(tmp_path / "run")
+
+
+def test_connect_checks_peer(tmp_path):
+    path = str(tmp_path / "rayshell.sock")
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(1)
+    engine = RemoteEngine.__new__(RemoteEngine)
+    engine.path = path
+    sock = engine.connect(timeout=1)
+    assert peerUid(sock) == os.getuid()
+    sock.close()
+    server.close()
@@ -0,0 +1,79 @@
+from apps.rayshell.core import history
+from apps.rayshell.core.history import HistoryStore
+
+COMMANDS = ["git status", "docker ps -a", "git checkout main", "ls -la", "git log --oneline"]
+
+
+def store(path, commands=COMMANDS):
+    s = HistoryStore(path / "history.db")
+    for i, cmd in enumerate(commands):
+        s.add(cmd, "executed", cwd="/tmp", ts=i)
+    s.flush()
+    return s
+
+
+def test_trigram_search(tmp_path):
+    s = store(tmp_path)
+    assert s.fts
+    assert [e.cmd for e in s.search("checkout")] == ["git checkout main"]
+    assert [e.cmd for e in s.search("git ma")] == ["git checkout main"]
+    s.close()
+
+
+def test_falls_back_without_trigram(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "FTS", "CREATE VIRTUAL TABLE events_fts USING fts5(cmd, tokenize='missing');")
+    s = store(tmp_path)
+    assert not s.fts
+    assert [e.cmd for e in s.search("checkout")] == ["git checkout main"]
+    assert [e.cmd for e in s.search("dkr")] == ["docker ps -a"]
+    s.close()
+
+
+def test_index_rebuilt_after_fallback(tmp_path, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(history, "FTS", "CREATE VIRTUAL TABLE events_fts USING fts5(cmd, tokenize='missing');")
+        store(tmp_path).close()
+    s = HistoryStore(tmp_path / "history.db")
+    assert s.fts
+    assert [e.cmd for e in s.search("docker")] == ["docker ps -a"]
+    s.close()
+
+
+def test_ranking_prefers_prefix_then_boundary(tmp_path):
+    s = store(tmp_path, ["sudo apt install git", "legit-tool", "git push", "cd repo/git"])
+    assert [e.cmd for e in s.search("git")] == ["git push", "cd repo/git", "sudo apt install git", "legit-tool"]
+    s.close()
+
+
+def test_ranking_demotes_failures_and_boosts_repeats(tmp_path):
+    s = HistoryStore(tmp_path / "history.db")
+    s.add("make test", "executed", cwd="/src", exit=0, ts=1)
+    s.add("make build", "executed", cwd="/src", exit=0, ts=2)
+    s.add("make test", "executed", cwd="/src", exit=0, ts=3)
+    s.add("make clean", "executed", cwd="/src", exit=2, ts=4)
+    s.flush()
+    assert [e.cmd for e in s.search("make")] == ["make test", "make build", "make clean"]
+    assert s.recent() == ["make build", "make test", "make clean"]
+    s.close()
+
+
+def test_cwd_breaks_ties(tmp_path):
+    s = HistoryStore(tmp_path / "history.db")
+    s.add("npm run dev", "executed", cwd="/web", ts=1)
+    s.add("npm run lint", "executed", cwd="/api", ts=2)
+    s.flush()
+    assert s.search("npm", cwd="/web")[0].cmd == "npm run dev"
+    assert s.search("npm", cwd="/api")[0].cmd == "npm run lint"
+    s.close()
+
+
+def test_suggestion_keeps_kind_and_gets_exit(tmp_path):
+    s = HistoryStore(tmp_path / "history.db")
+    ran = s.add("df -h", "suggested", cwd="/tmp")
+    s.add("rm -rf build", "suggested", cwd="/tmp")
+    s.add("ls", "literal", cwd="/tmp")
+    s.setExit("df -h", ran, 0)
+    s.flush()
+    rows = {e.cmd: (e.kind, e.exit) for e in s.search("")}
+    assert rows == {"df -h": ("suggested", 0), "rm -rf build": ("suggested", None), "ls": ("literal", None)}
+    s.close()
@@ -0,0 +1,46 @@
+import threading
+import httpx
+import pytest
+
+pytest.importorskip("llama_cpp")
+from apps.rayshell.core import httpbackend
+from apps.rayshell.core.httpbackend import HttpEngine
+
+
+class LocalEngine:
+    def __init__(self):
+        self.state = "ready"
+        self.error = None
+        self.timings = {}
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def generate(self, query, session=None, cancel=None, structured=False, context=None):
+        yield "local"
+
+
+def engine(monkeypatch, status):
+    def handler(request):
+        if request.url.path.endswith("/models"):
+            return httpx.Response(200, json={"data": []})
+        return httpx.Response(status, text="unavailable")
+
+    client = httpx.Client
+    monkeypatch.setattr(httpbackend.httpx, "Client", lambda **kw: client(transport=httpx.MockTransport(handler), **kw))
+    http = HttpEngine(LocalEngine)
+    assert http.ready.wait(5)
+    return http
+
+
+@pytest.mark.parametrize("status", [404, 500, 503])
+def test_server_errors_fall_back(monkeypatch, status):
+    http = engine(monkeypatch, status)
+    assert "".join(http.generate("hi", "s")) == "local"
+    assert http.fallback is not None
+
+
+def test_client_errors_are_raised(monkeypatch):
+    http = engine(monkeypatch, 400)
+    with pytest.raises(httpx.HTTPStatusError):
+        "".join(http.generate("hi", "s"))
+    assert http.fallback is None
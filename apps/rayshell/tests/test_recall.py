@@ -0,0 +1,37 @@
+import threading
+from apps.rayshell.core.recall import RecallIndex, HashEmbedder
+
+
+def test_lookup_before_open(tmp_path):
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        return HashEmbedder()
+
+    index = RecallIndex(slow, root=tmp_path)
+    assert index.lookup("how do i list open ports") is None
+    release.set()
+    assert index.ready.wait(5)
+    index.close()
+
+
+def test_lookup_after_failed_open(tmp_path):
+    def broken():
+        raise RuntimeError("no embedder")
+
+    index = RecallIndex(broken, root=tmp_path)
+    index.thread.join(5)
+    assert index.lookup("how do i list open ports") is None
+
+
+def test_paraphrase_is_recalled(tmp_path):
+    index = RecallIndex(HashEmbedder(), root=tmp_path)
+    assert index.ready.wait(5)
+    index.add("how do I list listening TCP ports", "[SHELL]: 'ss -ltnp'", "ss -ltnp")
+    index.close()
+    index = RecallIndex(HashEmbedder(), root=tmp_path)
+    assert index.ready.wait(5)
+    hit = index.lookup("list the listening tcp ports")
+    assert hit is not None and hit.command == "ss -ltnp"
+    index.close()
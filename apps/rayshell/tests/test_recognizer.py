@@ -0,0 +1,26 @@
+import threading, time
+from apps.rayshell.core import recognizer
+from apps.rayshell.core.recognizer import CommandRecognizer
+
+
+def test_classify_rescans_off_the_calling_thread(monkeypatch):
+    rec = CommandRecognizer()
+    scanned = threading.Event()
+    threads = []
+
+    def refresh():
+        threads.append(threading.current_thread())
+        scanned.set()
+
+    monkeypatch.setattr(rec, "pathStamp", lambda: ("changed",))
+    monkeypatch.setattr(rec, "refresh", refresh)
+    rec.lastCheck = time.monotonic() - recognizer.REFRESH_INTERVAL
+    assert rec.classify("ls -la")[0] == "command"
+    assert scanned.wait(5)
+    assert threads and threading.current_thread() not in threads
+
+
+def test_prose_goes_to_the_model():
+    rec = CommandRecognizer()
+    assert rec.classify("how do i list all files?")[0] == "llm"
+    assert rec.classify("what is the biggest file in my home")[0] == "llm"
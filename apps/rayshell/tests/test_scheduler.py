@@ -0,0 +1,31 @@
+import threading
+from apps.rayshell.core.scheduler import InferenceScheduler
+
+
+def test_workers_run_requests_concurrently():
+    scheduler = InferenceScheduler(workers=2)
+    started = threading.Barrier(2, timeout=5)
+
+    def work(request):
+        started.wait()
+        yield "done"
+
+    first = scheduler.submit("a", work)
+    second = scheduler.submit("b", work)
+    assert list(first) == ["done"] and list(second) == ["done"]
+    assert scheduler.stats()["completed"] == 2
+
+
+def test_same_key_is_coalesced():
+    scheduler = InferenceScheduler()
+    release = threading.Event()
+
+    def work(request):
+        release.wait(5)
+        yield "reply"
+
+    first = scheduler.submit("same", work)
+    second = scheduler.submit("same", work)
+    release.set()
+    assert list(first) == list(second) == ["reply"]
+    assert scheduler.stats()["coalesced"] == 1
@@ -0,0 +1,49 @@
+from apps.rayshell.core import sessionstore
+from apps.rayshell.core.sessionstore import SessionStore, lastSession, rememberSession
+
+
+def test_transcript_stops_at_torn_line(tmp_path):
+    store = SessionStore("s", root=tmp_path)
+    store.appendTranscript([{"query": "hi", "reply": "hello"}, {"query": "ls", "reply": "[SHELL]: 'ls'"}])
+    with open(tmp_path / "s" / "transcript.jsonl", "a", encoding="utf-8") as fh:
+        fh.write('{"query": "cut')
+    assert [e["query"] for e in store.transcript()] == ["hi", "ls"]
+    assert SessionStore("missing", root=tmp_path).transcript() == []
+
+
+def test_conversation_is_keyed(tmp_path):
+    store = SessionStore("s", root=tmp_path)
+    store.saveConversation("model-a", [1, 2, 3], [(1, 3)])
+    data = store.loadConversation("model-a")
+    assert data["tokens"] == [1, 2, 3] and data["turns"] == [(1, 3)] and data["state"] is None
+    assert store.loadConversation("model-b") is None
+    assert not list((tmp_path / "s").glob("*.tmp"))
+
+
+def test_unreadable_conversation_is_discarded(tmp_path):
+    (tmp_path / "s").mkdir()
+    (tmp_path / "s" / "conversation.pkl").write_bytes(b"not a pickle")
+    assert SessionStore("s", root=tmp_path).loadConversation("model-a") is None
+
+
+def test_remember_session_prunes_old_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessionstore, "SESSION_DIR", tmp_path)
+    monkeypatch.setattr(sessionstore, "LAST_SESSION", tmp_path / "last")
+    for i in range(sessionstore.KEEP_SESSIONS + 3):
+        (tmp_path / f"old-{i}").mkdir()
+    rememberSession("current")
+    assert lastSession() == "current"
+    assert len([p for p in tmp_path.iterdir() if p.is_dir()]) == sessionstore.KEEP_SESSIONS - 1
+
+
+def test_session_is_claimed_by_one_window(tmp_path, monkeypatch):
+    monkeypatch.setattr(sessionstore, "SESSION_DIR", tmp_path)
+    first = SessionStore("s", root=tmp_path)
+    assert first.claim()
+    assert not SessionStore("s", root=tmp_path).claim()
+    for i in range(sessionstore.KEEP_SESSIONS + 1):
+        (tmp_path / f"other-{i}").mkdir()
+    sessionstore.prune("current", keep=1)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["s"]
+    first.release()
+    assert SessionStore("s", root=tmp_path).claim()
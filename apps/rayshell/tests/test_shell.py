@@ -0,0 +1,31 @@
+import queue
+import pytest
+
+pytest.importorskip("llama_cpp")
+from apps.rayshell.core.shell import QueryQueue
+
+
+def test_duplicate_query_is_coalesced():
+    queries = QueryQueue(maxsize=4)
+    assert queries.put("list open ports")
+    assert not queries.put("list open ports")
+    assert queries.put("show disk usage")
+    assert queries.qsize() == 2
+
+
+def test_running_query_still_coalesces_until_done():
+    queries = QueryQueue(maxsize=4)
+    queries.put("list open ports")
+    cmd = queries.get()
+    assert not queries.put("list open ports")
+    queries.done(cmd)
+    assert queries.put("list open ports")
+
+
+def test_full_queue_raises_without_marking_pending():
+    queries = QueryQueue(maxsize=1)
+    queries.put("a")
+    with pytest.raises(queue.Full):
+        queries.put("b")
+    queries.done(queries.get())
+    assert queries.put("b")
@@ -1,13 +1,14 @@
 from PyQt6.QtCore import Qt, pyqtSignal, pyqtSlot, QTimer, QMetaObject, Q_ARG, QEvent
-from PyQt6.QtGui import QFont, QTextCursor, QColor, QPainter, QTextOption
+from PyQt6.QtGui import QFont, QTextCursor, QTextCharFormat, QColor, QPainter, QTextOption
 from PyQt6.QtWidgets import (
     QWidget, QMainWindow, QApplication, QVBoxLayout, QLabel, QTextEdit,
     QTabWidget, QSizePolicy, QHBoxLayout, QPushButton, QGraphicsDropShadowEffect,
-    QMessageBox
+    QMessageBox, QFrame, QLineEdit, QListWidget, QListWidgetItem
 )
 from apps.rayshell.core.shell import RayShell
 from apps.rayshell.core.terminal import Terminal
-import os, re, sys
+from apps.rayshell.core.history import commandHistory
+import os, re, sys, time, signal
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../../..")))
 
@@ -37,8 +38,88 @@ class CRTOverlay(QWidget):
         painter.end()
 
 
+class HistorySearch(QFrame):
+    chosen = pyqtSignal(str)
+
+    def __init__(self, history, parent, cwd=None):
+        super().__init__(parent)
+        self.history = history
+        self.cwd = cwd or os.getcwd
+        self.setObjectName("historySearch")
+        self.query = QLineEdit(self)
+        self.query.setPlaceholderText("history search")
+        self.results = QListWidget(self)
+        self.status = QLabel(self)
+        layout = QVBoxLayout()
+        layout.setContentsMargins(4, 4, 4, 4)
+        layout.addWidget(self.results)
+        layout.addWidget(self.query)
+        layout.addWidget(self.status)
+        self.setLayout(layout)
+        self.query.textChanged.connect(self.search)
+        self.query.installEventFilter(self)
+        self.results.itemActivated.connect(lambda item: self.choose(item.text()))
+        self.hide()
+
+    def open(self, text=""):
+        parent = self.parentWidget()
+        height = min(parent.height(), 260)
+        self.setGeometry(0, parent.height() - height, parent.width(), height)
+        self.query.setText(text)
+        self.search(text)
+        self.show()
+        self.raise_()
+        self.query.setFocus()
+
+    def search(self, text):
+        start = time.perf_counter()
+        entries = self.history.search(text, cwd=self.cwd())
+        elapsed = (time.perf_counter() - start) * 1000
+        self.results.clear()
+        for entry in reversed(entries):
+            item = QListWidgetItem(entry.cmd)
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.ts))
+            item.setToolTip(f"{stamp}  {entry.kind}  exit={entry.exit}  {entry.cwd}")
+            self.results.addItem(item)
+        self.results.setCurrentRow(self.results.count() - 1)
+        self.status.setText(f"{len(entries)} matches in {elapsed:.1f}ms")
+
+    def step(self, delta):
+        count = self.results.count()
+        if count:
+            self.results.setCurrentRow((self.results.currentRow() + delta) % count)
+
+    def choose(self, text):
+        self.dismiss()
+        if text:
+            self.chosen.emit(text)
+
+    def dismiss(self):
+        self.hide()
+        self.parentWidget().setFocus()
+
+    def eventFilter(self, source, event):
+        if source is self.query and event.type() == QEvent.Type.KeyPress:
+            key = event.key()
+            if key == Qt.Key.Key_Escape:
+                self.dismiss()
+                return True
+            if key == Qt.Key.Key_R and event.modifiers() == Qt.KeyboardModifier.ControlModifier:
+                self.step(-1)
+                return True
+            if key in (Qt.Key.Key_Up, Qt.Key.Key_Down):
+                self.step(-1 if key == Qt.Key.Key_Up else 1)
+                return True
+            if key in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
+                item = self.results.currentItem()
+                self.choose(item.text() if item else "")
+                return True
+        return super().eventFilter(source, event)
+
+
 class TextWidget(QTextEdit):
     commandEntered = pyqtSignal(str)
+    completionReady = pyqtSignal(str, object)
 
     def __init__(self, prompt="", parent=None, terminal="", font="", size=10):
         super().__init__(parent)
@@ -70,9 +151,49 @@ class TextWidget(QTextEdit):
         self.loaderTimer = QTimer()
         self.loaderTimer.timeout.connect(self.updateLoader)
 
+        self.completer = None
+        self.completionReady.connect(self.applyCompletion)
+        self.historySearch = None
+
+    def setCompleter(self, completer):
+        self.completer = completer
+        completer.addListener(self.completionReady.emit)
+
+    def setHistory(self, history, cwd=None):
+        self.historySearch = HistorySearch(history, self, cwd)
+        self.historySearch.chosen.connect(self.applyHistory)
+
+    @pyqtSlot(str)
+    def applyHistory(self, cmd):
+        if not self.isReadOnly():
+            self.replaceInput(cmd)
+
+    def currentInput(self):
+        return self.toPlainText()[self.prompt_block.position() + len(self.prompt):]
+
+    def replaceInput(self, text):
+        cursor = self.textCursor()
+        cursor.setPosition(self.prompt_block.position() + len(self.prompt))
+        cursor.movePosition(QTextCursor.MoveOperation.End, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(text)
+        self.setTextCursor(cursor)
+
+    @pyqtSlot(str, object)
+    def applyCompletion(self, line, result):
+        if self.isReadOnly() or self.currentInput() != line:
+            return
+        if result.line != line:
+            self.replaceInput(result.line)
+        elif result.candidates:
+            self.append("  ".join(result.candidates))
+            self.insertPrompt()
+            self.insertPlainText(line)
+
     def eventFilter(self, source, event):
         if source == self and event.type() == QEvent.Type.Resize:
             self.crtOverlay.resize(self.size())
+            if self.historySearch is not None and self.historySearch.isVisible():
+                self.historySearch.open(self.historySearch.query.text())
         return super().eventFilter(source, event)
 
     def insertPrompt(self):
@@ -80,6 +201,21 @@ class TextWidget(QTextEdit):
         self.prompt_block = self.document().lastBlock()
         self.setReadOnly(False)
 
+    def insertAbovePrompt(self, text, color, newLine=False):
+        # job output lands above the live prompt so it never becomes part of currentInput
+        if self.prompt_block.position() == 0:
+            cursor = QTextCursor(self.prompt_block)
+            cursor.insertBlock()
+            self.prompt_block = cursor.block()
+        cursor = QTextCursor(self.prompt_block)
+        cursor.movePosition(QTextCursor.MoveOperation.PreviousCharacter)
+        fmt = QTextCharFormat()
+        fmt.setForeground(QColor(color))
+        if newLine:
+            cursor.insertBlock()
+        cursor.insertText(text, fmt)
+        self.ensureCursorVisible()
+
     def startLoader(self):
         if self.loaderActive:
             return
@@ -130,6 +266,18 @@ class TextWidget(QTextEdit):
             else:
                 self.commandEntered.emit("__LLM_PAUSE__")
 
+        if event.key() == Qt.Key.Key_R and event.modifiers() == Qt.KeyboardModifier.ControlModifier:
+            if self.historySearch is not None and not self.isReadOnly():
+                self.historySearch.open(self.currentInput())
+            return
+
+        if event.key() == Qt.Key.Key_Tab and self.completer is not None:
+            line = self.currentInput()
+            result = self.completer.complete(line)
+            if result is not None:
+                self.applyCompletion(line, result)
+            return
+
         if event.key() == Qt.Key.Key_Return:
             cursor.movePosition(QTextCursor.MoveOperation.End)
             self.setTextCursor(cursor)
@@ -146,6 +294,14 @@ class TextWidget(QTextEdit):
 
 class ShellWindow(QWidget):
     outputReceived = pyqtSignal(str)
+    chunkReceived = pyqtSignal(str)
+    streamEnded = pyqtSignal()
+    commandQueued = pyqtSignal()
+    commandStarted = pyqtSignal(int, str)
+    commandChunk = pyqtSignal(int, str, str)
+    commandEnded = pyqtSignal(int, str)
+
+    streamColors = {"stdout": "#fff6cc", "stderr": "#ff8f6b", "info": "#9aa3b2"}
 
     def __init__(self, shell, parent=None):
         super().__init__(parent)
@@ -154,19 +310,37 @@ class ShellWindow(QWidget):
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setWindowFlags(Qt.WindowType.FramelessWindowHint)
         self.outputArea.commandEntered.connect(self.handleInput)
+        self.outputArea.setCompleter(self.shell.completer)
+        self.outputArea.setHistory(self.shell.history)
         layout = QVBoxLayout()
         layout.addWidget(self.outputArea)
         self.setLayout(layout)
         self.shell.addListener(self.receiveOutput)
         self.outputReceived.connect(self.displayOutput)
+        self.chunkReceived.connect(self.displayChunk)
+        self.streamEnded.connect(self.endStream)
+        self.commandQueued.connect(self.releasePrompt)
+        self.commandStarted.connect(self.beginCommandOutput)
+        self.commandChunk.connect(self.displayCommandChunk)
+        self.commandEnded.connect(self.endCommandOutput)
+        self.streamActive = False
+        self.lastJob = None
         initial = getattr(self.shell, "initialMsg", lambda: "")()
         if initial:
             self.displayOutput(initial)
 
     def handleInput(self, cmd):
-        self.outputArea.startLoader()
         if cmd in ("__LLM_INTERRUPT__", "__LLM_PAUSE__"):
             self.shell.interruptLLM()
+            return
+        if cmd.startswith(":jobs") or cmd.startswith(":kill"):
+            self.handleJobCommand(cmd)
+            return
+        if cmd == ":reset":
+            self.shell.resetConversation()
+            self.displayOutput("Conversation reset.")
+            return
+        self.outputArea.startLoader()
         self.shell.parseCmd(cmd)
 
     def receiveOutput(self, text):
@@ -178,6 +352,21 @@ class ShellWindow(QWidget):
                 Qt.ConnectionType.QueuedConnection,
                 Q_ARG(str, cmd)
             )
+        elif text.startswith("__STREAM_CHUNK__::"):
+            self.chunkReceived.emit(text.split("::", 1)[1])
+        elif text.startswith("__STREAM_END__::"):
+            self.streamEnded.emit()
+        elif text.startswith("__CMD_QUEUED__::"):
+            self.commandQueued.emit()
+        elif text.startswith("__CMD_START__::"):
+            _, jobId, cmd = text.split("::", 2)
+            self.commandStarted.emit(int(jobId), cmd)
+        elif text.startswith("__CMD_CHUNK__::"):
+            _, jobId, stream, chunk = text.split("::", 3)
+            self.commandChunk.emit(int(jobId), stream, chunk)
+        elif text.startswith("__CMD_END__::"):
+            _, jobId, code = text.split("::", 2)
+            self.commandEnded.emit(int(jobId), code)
         else:
             self.outputReceived.emit(text)
 
@@ -192,7 +381,6 @@ class ShellWindow(QWidget):
             QMessageBox.StandardButton.No
         )
         if reply == QMessageBox.StandardButton.Yes:
-            self.outputArea.startLoader()
             self.shell.sendCmd(cmd)
         else:
             self.displayOutput("Command execution aborted by user.\n")
@@ -212,6 +400,75 @@ class ShellWindow(QWidget):
         self.outputArea.insertPrompt()
 
 
+    def appendText(self, text, color="#fff6cc"):
+        cursor = self.outputArea.textCursor()
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        fmt = cursor.charFormat()
+        fmt.setForeground(QColor(color))
+        cursor.insertText(text, fmt)
+        self.outputArea.setTextCursor(cursor)
+        self.outputArea.ensureCursorVisible()
+
+    @pyqtSlot(str)
+    def displayChunk(self, text):
+        if not self.streamActive:
+            self.outputArea.stopLoader()
+            self.outputArea.append('<span style="color:#fff6cc;"></span>')
+            self.streamActive = True
+        self.appendText(text)
+
+    def handleJobCommand(self, cmd):
+        parts = cmd.split()
+        if parts[0] == ":jobs":
+            rows = [
+                f"[{j['id']}] {j['state']:<9} exit={j['exit']} wall={j['wall']:.1f}s cpu={j['cpu']:.1f}s  {j['cmd']}"
+                for j in self.shell.listJobs()
+            ]
+            self.displayOutput("\n".join(rows) or "No jobs.")
+            return
+        if len(parts) < 2 or not parts[1].lstrip("%").isdigit():
+            self.displayOutput("usage: :kill <job id> [INT|TERM|KILL]")
+            return
+        sig = getattr(signal, "SIG" + (parts[2].upper() if len(parts) > 2 else "INT"), signal.SIGINT)
+        jobId = int(parts[1].lstrip("%"))
+        if self.shell.killJob(jobId, sig):
+            self.displayOutput(f"Sent {sig.name} to job {jobId}.")
+        else:
+            self.displayOutput(f"Job {jobId} isn't running.")
+
+    @pyqtSlot()
+    def releasePrompt(self):
+        if self.outputArea.isReadOnly() and not self.streamActive:
+            self.outputArea.stopLoader()
+            self.outputArea.insertPrompt()
+
+    @pyqtSlot(int, str)
+    def beginCommandOutput(self, jobId, cmd):
+        self.outputArea.insertAbovePrompt(f"OUTPUT [{jobId}] {cmd}:", self.streamColors["stdout"], newLine=True)
+        self.outputArea.insertAbovePrompt("", self.streamColors["stdout"], newLine=True)
+        self.lastJob = jobId
+
+    @pyqtSlot(int, str, str)
+    def displayCommandChunk(self, jobId, stream, text):
+        if jobId != self.lastJob:
+            self.outputArea.insertAbovePrompt(f"[{jobId}] ", self.streamColors["info"], newLine=True)
+            self.lastJob = jobId
+        self.outputArea.insertAbovePrompt(text, self.streamColors.get(stream, "#fff6cc"))
+
+    @pyqtSlot(int, str)
+    def endCommandOutput(self, jobId, code):
+        if code != "0":
+            self.outputArea.insertAbovePrompt(f"[{jobId} exit {code}]", self.streamColors["info"], newLine=True)
+        self.lastJob = None
+
+    @pyqtSlot()
+    def endStream(self):
+        if not self.streamActive:
+            self.outputArea.stopLoader()
+        self.streamActive = False
+        self.outputArea.insertPrompt()
+
+
 class TerminalWindow(QWidget):
     outputReceived = pyqtSignal(str)
 
@@ -223,6 +480,8 @@ class TerminalWindow(QWidget):
         self.outputArea = TextWidget(parent=self, terminal=self.terminal, font="VT323", size=18)
         self.outputArea.setStyleSheet("font-size: 25px")
         self.outputArea.commandEntered.connect(self.handleInput)
+        self.history = commandHistory()
+        self.outputArea.setHistory(self.history, self.terminal.cwd)
         layout = QVBoxLayout()
         layout.addWidget(self.outputArea)
         self.setLayout(layout)
@@ -235,6 +494,7 @@ class TerminalWindow(QWidget):
 
     def handleInput(self, cmd):
         self._lastCmd = cmd
+        self.history.add(cmd, "executed", cwd=self.terminal.cwd(), source="terminal")
         self.terminal.sendCmd(cmd + '\n')
 
     def receiveOutput(self, text):
@@ -273,6 +533,10 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(mainWidget)
         mainWidget.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground, True)
 
+    def closeEvent(self, event):
+        self.rayShellWindow.shell.close()
+        super().closeEvent(event)
+
     def resizeEvent(self, event):
         super().resizeEvent(event)
         if hasattr(self, 'crtOverlay'):